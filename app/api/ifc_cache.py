@@ -0,0 +1,104 @@
+"""
+IFC Cache - process-wide cache of parsed IFC models and scan results
+
+PURPOSE:
+Parsing an IFC file with ifcopenshell takes seconds for real projects, and
+the SI-1 endpoints used to do it on every request (twice per /check: once
+inside `scan_ifc_basic` and once more for `build_sectors`). Scans here run
+on the handle from the model cache, so each file version is parsed once.
+
+HOW IT WORKS:
+Entries are keyed by `(path, st_mtime_ns, st_size)`, so a model that is
+re-exported to the same path is picked up automatically on the next request.
+Both caches are small LRUs; evicted `ifcopenshell.file` handles are released
+as soon as no in-flight request still holds them. Cold lookups hold a
+per-key lock, so concurrent requests for the same file version wait for a
+single parse instead of each running their own.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import ifcopenshell
+
+
+def file_fingerprint(path: str) -> Tuple[str, int, int]:
+    """
+    Return the cache key for `path`: (absolute path, mtime in ns, size).
+
+    Raises FileNotFoundError if the file does not exist, which the routers
+    already map to a 400.
+    """
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+
+# key -> [lock, number of threads using it]; entries go away with their last user
+_KEY_LOCKS: Dict[Tuple[Any, ...], List[Any]] = {}
+_KEY_LOCKS_GUARD = threading.Lock()
+
+
+@contextmanager
+def _key_lock(key: Tuple[Any, ...]) -> Iterator[None]:
+    """Serialize the callers of one cache key (lru_cache itself has no lock)."""
+    with _KEY_LOCKS_GUARD:
+        entry = _KEY_LOCKS.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _KEY_LOCKS_GUARD:
+            entry[1] -= 1
+            if not entry[1]:
+                del _KEY_LOCKS[key]
+
+
+@lru_cache(maxsize=16)
+def _open_cached(path: str, mtime_ns: int, size: int) -> "ifcopenshell.file":
+    # Imported here so importing the API does not load ifcopenshell
+    import ifcopenshell
+
+    return ifcopenshell.open(path)
+
+
+@lru_cache(maxsize=16)
+def _scan_cached(path: str, mtime_ns: int, size: int, preview_limit: int) -> Dict[str, Any]:
+    from tools.checker_sub_si1_checker import scan_ifc_basic
+
+    # scan the cached handle instead of letting the scanner parse again
+    ifc_file = open_ifc(path, (path, mtime_ns, size))
+    return scan_ifc_basic(path, preview_limit=preview_limit, ifc_file=ifc_file)
+
+
+def open_ifc(path: str, fingerprint: Optional[Tuple[str, int, int]] = None) -> "ifcopenshell.file":
+    """
+    Open `path`, reusing the parsed model while the file is unchanged.
+
+    Pass `fingerprint` when the caller has already stat'ed the file.
+    """
+    key = fingerprint or file_fingerprint(path)
+    with _key_lock(("open",) + key):
+        return _open_cached(*key)
+
+
+def get_scan(
+    path: str,
+    preview_limit: int = 200,
+    fingerprint: Optional[Tuple[str, int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Return `scan_ifc_basic(path, preview_limit)`, cached per file version.
+
+    The cached dict is shared between requests; callers that modify it
+    must work on a copy. `fingerprint` works as in `open_ifc`.
+    """
+    key = fingerprint or file_fingerprint(path)
+    # _scan_cached takes the "open" lock inside this one: always in this order
+    with _key_lock(("scan",) + key + (preview_limit,)):
+        return _scan_cached(*key, preview_limit)
+
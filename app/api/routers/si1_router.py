@@ -21,7 +21,18 @@ This endpoint checks fire compartmentation (sectors) for FO-SEZ buildings.
 It ensures fire sectors don't exceed maximum area limits based on building use.
 """
 
-from fastapi import APIRouter, HTTPException
+import copy
+import hashlib
+import os
+from email.utils import formatdate
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import anyio
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from app.api.models import (
     SI1ScanRequest, 
     SI1ScanResponse,
@@ -31,19 +42,247 @@ from app.api.models import (
 )
 import logging
 
-# Import the actual compliance functions from utils/
-# These are the ONLY connections to your utility files
-from tools.checker_sub_si1_checker import scan_ifc_basic, check_sector_size_compliance, build_sectors
-from tools.checker_SI_1_interior_propagation import load_rules_config
-import ifcopenshell
+# The actual compliance functions from utils/ are imported inside the
+# functions that use them: they pull in ifcopenshell, which is slow to import
+# and would otherwise be paid at app startup rather than on the first check.
+from app.api.ifc_cache import file_fingerprint, get_scan, open_ifc
+
+
+def _orjson_default(obj: Any) -> Any:
+    """
+    Encode values orjson does not handle natively.
+
+    The utility functions sometimes leak `Path` objects into their results;
+    numpy arrays and scalars are covered by OPT_SERIALIZE_NUMPY.
+    """
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _dumps(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=_orjson_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+class SI1JSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse with a `default=` hook for the types our utilities return.
+
+    Handlers return this directly (no `response_model`), so FastAPI skips
+    `jsonable_encoder` and the second Pydantic validation pass over the
+    large sectors/spaces payloads. The response models stay in `responses`
+    for the OpenAPI docs only.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
 
 # Create router
-router = APIRouter()
+router = APIRouter(default_response_class=SI1JSONResponse)
 logger = logging.getLogger(__name__)
 
+# ifcopenshell parsing is CPU- and memory-heavy and holds the GIL for long
+# stretches, so cap how many IFC jobs run at once instead of letting them
+# fill AnyIO's default 40-thread pool.
+_IFC_LIMITER = anyio.CapacityLimiter(os.cpu_count() or 4)
+
+_DEFAULT_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "data_push",
+    "rulesdb_si_si1_rules.json.json"
+)
+
+
+@lru_cache(maxsize=1)
+def _default_rules() -> Dict[str, Any]:
+    """Default rules, loaded on the first /check instead of on every one."""
+    from tools.checker_SI_1_interior_propagation import load_rules_config
+
+    return load_rules_config(_DEFAULT_CONFIG_PATH) if os.path.exists(_DEFAULT_CONFIG_PATH) else {}
+
+
+def _stat_or_400(ifc_path: str) -> Tuple[str, int, int]:
+    """
+    Stat the IFC once per request and return its cache fingerprint.
+
+    Missing files are rejected here, before any parsing; the fingerprint is
+    then reused for the ETag and both IFC cache lookups.
+    """
+    try:
+        return file_fingerprint(ifc_path)
+    except FileNotFoundError:
+        logger.error("IFC file not found: %s", ifc_path)
+        raise HTTPException(status_code=400, detail=f"IFC file not found: {ifc_path}")
+
+
+def _request_etag(request: Any, ifc_key: Tuple[str, int, int]) -> Tuple[str, int]:
+    """
+    Strong ETag for a /scan or /check request, plus the IFC mtime (ns).
+
+    The result only depends on the IFC file version, the request
+    parameters and, for /check, the rules file in use (the given one or the
+    default), so hashing those is enough and lets us answer 304 before doing
+    any IFC work.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(ifc_key).encode())
+    h.update(orjson.dumps(request.model_dump(), option=orjson.OPT_SORT_KEYS))
+    if hasattr(request, "config_path"):
+        config_path = request.config_path or _DEFAULT_CONFIG_PATH
+        if os.path.exists(config_path):
+            h.update(repr(file_fingerprint(config_path)).encode())
+    return f'"{h.hexdigest()}"', ifc_key[1]
+
+
+def _etag_matches(http_request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already covers `etag`."""
+    header = http_request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return "*" in candidates or etag in candidates
 
-@router.post("/scan", response_model=SI1ScanResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-def scan_ifc_endpoint(request: SI1ScanRequest):
+
+def _cache_headers(etag: str, mtime_ns: int) -> Dict[str, str]:
+    # no-cache = clients may store the body but must revalidate, since the
+    # IFC can change on disk at any time
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime_ns / 1e9, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def _columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Column names for the columnar preview tables, in first-seen key order.
+
+    Sending the keys once instead of per row roughly halves the preview
+    payloads; keys missing from a row become None.
+    """
+    columns: Dict[str, None] = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+# Rows per chunk when streaming the /scan previews
+_STREAM_BATCH = 100
+_SCAN_TABLES = ("spaces_preview", "doors_preview")
+
+
+def _iter_scan_json(request: SI1ScanRequest, scan_result: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Yield the /scan response (same shape as SI1ScanResponse) as JSON.
+
+    Works straight off the cached scan: the scalar fields go out first,
+    then each preview table as `{"columns": [...], "rows": [[...], ...]}`,
+    converting `_STREAM_BATCH` rows at a time. The columnar payload is
+    never built as a whole, neither before nor during streaming.
+    """
+    head = {
+        "ifc_path": scan_result.get("ifc_path", request.ifc_path),
+        "total_spaces": scan_result.get("total_spaces", 0),
+        "total_doors": scan_result.get("total_doors", 0),
+        "data_quality": scan_result.get("data_quality", {}),
+        "message": scan_result.get("message"),
+    }
+    yield _dumps(head)[:-1]  # drop the closing brace
+    for key in _SCAN_TABLES:
+        rows = scan_result.get(key, [])
+        names = _columns(rows)
+        yield b',"' + key.encode() + b'":{"columns":' + _dumps(names) + b',"rows":['
+        for start in range(0, len(rows), _STREAM_BATCH):
+            batch = [[row.get(name) for name in names] for row in rows[start:start + _STREAM_BATCH]]
+            chunk = _dumps(batch)[1:-1]
+            yield (b"," + chunk) if start else chunk
+        yield b"]}"
+    yield b"}"
+
+
+def _run_scan(request: SI1ScanRequest, ifc_key: Tuple[str, int, int]) -> Dict[str, Any]:
+    """Blocking part of /scan; runs in a worker thread."""
+    # Call the utility function (imported from utils/), cached per file version.
+    # The cached dict is shared: _iter_scan_json only reads it.
+    return get_scan(request.ifc_path, request.preview_limit, ifc_key)
+
+
+def _load_ifc(
+    ifc_path: str, preview_limit: int, ifc_key: Tuple[str, int, int]
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Open the IFC, then run the basic scan on that same handle.
+
+    Both go through the IFC cache: the scan reuses the parsed model, so a
+    cold /check parses the file once and holds a single limiter slot.
+    """
+    ifc_file = open_ifc(ifc_path, ifc_key)
+    return ifc_file, get_scan(ifc_path, preview_limit, ifc_key)
+
+
+def _run_check(request: SI1ComplianceRequest, ifc_file: Any, scan_result: Dict[str, Any]) -> dict:
+    """Blocking part of /check; runs in a worker thread."""
+    from tools.checker_sub_si1_checker import check_sector_size_compliance, build_sectors
+    from tools.checker_SI_1_interior_propagation import load_rules_config
+    
+    # Load configuration
+    if request.config_path:
+        rules = load_rules_config(request.config_path)
+    else:
+        # Shared default rules: copy the top level and project_defaults,
+        # which are the only parts we modify below
+        rules = dict(_default_rules())
+    
+    # Override with request parameters
+    rules["project_defaults"] = dict(rules.get("project_defaults") or {})
+    rules["project_defaults"]["building_use"] = request.building_use
+    rules["project_defaults"]["sprinklers"] = request.sprinklers
+    
+    # The cached scan is shared; build_sectors writes sector ids into its rows
+    scan_result = copy.deepcopy(scan_result)
+    
+    # Build sectors
+    sectors, used_fallback = build_sectors(ifc_file, scan_result, rules)
+    
+    # Check compliance
+    compliance_result = check_sector_size_compliance(
+        sectors=sectors,
+        rules=rules,
+        building_use=request.building_use,
+        sprinklers=request.sprinklers,
+        used_fallback=used_fallback
+    )
+    
+    # Extract non-compliant sectors
+    non_compliant = [
+        {
+            "sector_id": sector_id,
+            "actual_area_m2": sector_data.get("total_area_m2", 0),
+            "allowed_area_m2": sector_data.get("allowed_area_m2", 0),
+            "reason": sector_data.get("reason", "Area exceeds limit")
+        }
+        for sector_id, sector_data in sectors.items()
+        if sector_data.get("compliant") is False
+    ]
+    
+    # Build the payload with the same shape as SI1ComplianceResponse
+    return {
+        "status": compliance_result.get("status", "unknown"),
+        "sectors": sectors,
+        "compliance_summary": compliance_result,
+        "non_compliant_sectors": non_compliant,
+        "message": compliance_result.get("message")
+    }
+
+
+@router.post("/scan", responses={200: {"model": SI1ScanResponse}, 400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+async def scan_ifc_endpoint(request: SI1ScanRequest, http_request: Request):
     """
     Scan IFC file for fire safety data (spaces, doors, zones).
     
@@ -62,6 +301,9 @@ def scan_ifc_endpoint(request: SI1ScanRequest):
     - List of doors with fire ratings
     - Data quality assessment
     
+    `spaces_preview` and `doors_preview` are columnar:
+    `{"columns": ["name", ...], "rows": [["Room 1", ...], ...]}`
+    
     **Example request:**
     ```json
     {
@@ -71,39 +313,41 @@ def scan_ifc_endpoint(request: SI1ScanRequest):
     ```
     """
     try:
-        logger.info(f"SI-1 scan requested for: {request.ifc_path}")
+        logger.info("SI-1 scan requested for: %s", request.ifc_path)
         
-        # Call the utility function (imported from utils/)
-        scan_result = scan_ifc_basic(
-            ifc_path=request.ifc_path,
-            preview_limit=request.preview_limit
-        )
+        # Same file version + same parameters -> same result
+        ifc_key = _stat_or_400(request.ifc_path)
+        etag, mtime_ns = _request_etag(request, ifc_key)
+        if _etag_matches(http_request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag, mtime_ns))
         
-        # Transform the result into our response model
-        response = SI1ScanResponse(
-            ifc_path=scan_result.get("ifc_path", request.ifc_path),
-            total_spaces=scan_result.get("total_spaces", 0),
-            total_doors=scan_result.get("total_doors", 0),
-            spaces_preview=scan_result.get("spaces_preview", []),
-            doors_preview=scan_result.get("doors_preview", []),
-            data_quality=scan_result.get("data_quality", {}),
-            message=scan_result.get("message")
+        # Run the IFC work off the event loop so other requests keep flowing
+        scan_result = await anyio.to_thread.run_sync(_run_scan, request, ifc_key, limiter=_IFC_LIMITER)
+        
+        logger.info(
+            "SI-1 scan completed: %s spaces, %s doors",
+            scan_result.get("total_spaces", 0), scan_result.get("total_doors", 0),
+        )
+        return StreamingResponse(
+            _iter_scan_json(request, scan_result),
+            media_type="application/json",
+            headers=_cache_headers(etag, mtime_ns),
         )
         
-        logger.info(f"SI-1 scan completed: {response.total_spaces} spaces, {response.total_doors} doors")
-        return response
+    except HTTPException:
+        raise
         
     except FileNotFoundError as e:
-        logger.error(f"IFC file not found: {request.ifc_path}")
+        logger.error("IFC file not found: %s", request.ifc_path)
         raise HTTPException(status_code=400, detail=f"IFC file not found: {request.ifc_path}")
         
     except Exception as e:
-        logger.error(f"Error in SI-1 scan: {str(e)}", exc_info=True)
+        logger.error("Error in SI-1 scan: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal error during SI-1 scan: {str(e)}")
 
 
-@router.post("/check", response_model=SI1ComplianceResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-def check_sectors_endpoint(request: SI1ComplianceRequest):
+@router.post("/check", responses={200: {"model": SI1ComplianceResponse}, 400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+async def check_sectors_endpoint(request: SI1ComplianceRequest, http_request: Request):
     """
     Check fire sector size compliance (SI-1).
     
@@ -133,103 +377,78 @@ def check_sectors_endpoint(request: SI1ComplianceRequest):
     ```
     """
     try:
-        logger.info(f"SI-1 compliance check requested for: {request.ifc_path}")
-        
-        # Load configuration
-        if request.config_path:
-            rules = load_rules_config(request.config_path)
-        else:
-            # Use default config path
-            import os
-            default_config = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-                "data_push",
-                "rulesdb_si_si1_rules.json.json"
-            )
-            rules = load_rules_config(default_config) if os.path.exists(default_config) else {}
-        
-        # Override with request parameters
-        if not rules.get("project_defaults"):
-            rules["project_defaults"] = {}
-        rules["project_defaults"]["building_use"] = request.building_use
-        rules["project_defaults"]["sprinklers"] = request.sprinklers
-        
-        # Scan IFC
-        scan_result = scan_ifc_basic(request.ifc_path, preview_limit=1000)
+        logger.info("SI-1 compliance check requested for: %s", request.ifc_path)
         
-        # Open IFC file for sector building
-        ifc_file = ifcopenshell.open(request.ifc_path)
+        # Same file version + same parameters -> same result
+        ifc_key = _stat_or_400(request.ifc_path)
+        etag, mtime_ns = _request_etag(request, ifc_key)
+        if _etag_matches(http_request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag, mtime_ns))
         
-        # Build sectors
-        sectors, used_fallback = build_sectors(ifc_file, scan_result, rules)
-        
-        # Check compliance
-        compliance_result = check_sector_size_compliance(
-            sectors=sectors,
-            rules=rules,
-            building_use=request.building_use,
-            sprinklers=request.sprinklers,
-            used_fallback=used_fallback
+        # Run the IFC work off the event loop so other requests keep flowing
+        ifc_file, scan_result = await anyio.to_thread.run_sync(
+            _load_ifc, request.ifc_path, 1000, ifc_key, limiter=_IFC_LIMITER
         )
-        
-        # Extract non-compliant sectors
-        non_compliant = []
-        for sector_id, sector_data in sectors.items():
-            if sector_data.get("compliant") == False:
-                non_compliant.append({
-                    "sector_id": sector_id,
-                    "actual_area_m2": sector_data.get("total_area_m2", 0),
-                    "allowed_area_m2": sector_data.get("allowed_area_m2", 0),
-                    "reason": sector_data.get("reason", "Area exceeds limit")
-                })
-        
-        # Transform the result into our response model
-        response = SI1ComplianceResponse(
-            status=compliance_result.get("status", "unknown"),
-            sectors=sectors,
-            compliance_summary=compliance_result,
-            non_compliant_sectors=non_compliant,
-            message=compliance_result.get("message")
+        payload = await anyio.to_thread.run_sync(
+            _run_check, request, ifc_file, scan_result, limiter=_IFC_LIMITER
         )
         
-        logger.info(f"SI-1 compliance check completed: {response.status}")
-        return response
+        logger.info("SI-1 compliance check completed: %s", payload["status"])
+        return SI1JSONResponse(content=payload, headers=_cache_headers(etag, mtime_ns))
+        
+    except HTTPException:
+        raise
         
     except FileNotFoundError as e:
-        logger.error(f"IFC file not found: {request.ifc_path}")
+        logger.error("IFC file not found: %s", request.ifc_path)
         raise HTTPException(status_code=400, detail=f"IFC file not found: {request.ifc_path}")
         
     except Exception as e:
-        logger.error(f"Error in SI-1 compliance check: {str(e)}", exc_info=True)
+        logger.error("Error in SI-1 compliance check: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal error during SI-1 compliance check: {str(e)}")
 
 
+# /info is static: render it and its ETag once at import
+_INFO = {
+    "section": "SI-1",
+    "title": "Interior Propagation",
+    "description": "Checks fire compartmentation and sector size limits",
+    "regulations": "Spanish Technical Building Code (CTE) - Basic Document on Fire Safety (DB-SI)",
+    "what_it_checks": [
+        "Maximum fire sector area based on building use",
+        "Fire door ratings and locations",
+        "Special risk rooms",
+        "Fire separation between sectors"
+    ],
+    "required_parameters": {
+        "ifc_path": "Path to IFC file",
+        "building_use": "Building typology (residential, office, etc.)",
+        "sprinklers": "Boolean - does building have sprinklers?"
+    },
+    "output": {
+        "status": "compliant | non_compliant",
+        "sectors": "Dictionary of fire sectors with areas",
+        "non_compliant_sectors": "List of sectors exceeding limits"
+    },
+    "scan_output": {
+        "spaces_preview": "Columnar table: {columns: [names], rows: [[values]]}",
+        "doors_preview": "Columnar table: {columns: [names], rows: [[values]]}"
+    }
+}
+_INFO_BYTES = orjson.dumps(_INFO)
+_INFO_HEADERS = {
+    "ETag": f'"{hashlib.blake2b(_INFO_BYTES, digest_size=16).hexdigest()}"',
+    "Cache-Control": "public, max-age=3600",
+}
+
+
 @router.get("/info")
-def si1_info():
+async def si1_info(http_request: Request):
     """
     Get information about SI-1 compliance checks.
     
     Returns metadata about what this endpoint does.
     """
-    return {
-        "section": "SI-1",
-        "title": "Interior Propagation",
-        "description": "Checks fire compartmentation and sector size limits",
-        "regulations": "Spanish Technical Building Code (CTE) - Basic Document on Fire Safety (DB-SI)",
-        "what_it_checks": [
-            "Maximum fire sector area based on building use",
-            "Fire door ratings and locations",
-            "Special risk rooms",
-            "Fire separation between sectors"
-        ],
-        "required_parameters": {
-            "ifc_path": "Path to IFC file",
-            "building_use": "Building typology (residential, office, etc.)",
-            "sprinklers": "Boolean - does building have sprinklers?"
-        },
-        "output": {
-            "status": "compliant | non_compliant",
-            "sectors": "Dictionary of fire sectors with areas",
-            "non_compliant_sectors": "List of sectors exceeding limits"
-        }
-    }
+    if _etag_matches(http_request, _INFO_HEADERS["ETag"]):
+        return Response(status_code=304, headers=_INFO_HEADERS)
+    return Response(content=_INFO_BYTES, media_type="application/json", headers=_INFO_HEADERS)
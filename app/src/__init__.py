@@ -2,7 +2,7 @@
 IFC Fire Safety Compliance Checker Package
 """
 
-from .ifc_checker import check_ifc_file
+from .ifc_checker import check_ifc_file, check_ifc_files
 from .si1_scanner import scan_ifc_basic
 
-__all__ = ['check_ifc_file', 'scan_ifc_basic']
+__all__ = ['check_ifc_file', 'check_ifc_files', 'scan_ifc_basic']
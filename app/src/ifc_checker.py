@@ -4,11 +4,16 @@ IFC File Checker module
 Provides high-level API for checking IFC fire compliance.
 """
 
-from typing import Dict, Any, Tuple
-from .si1_scanner import scan_ifc_basic
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from .si1_scanner import scan_ifc_basic, scan_ifc_counts_only, source_fingerprint
+from .scan_cache import load_scan, store_scan
 
 
-def check_ifc_file(ifc_path: str) -> Dict[str, Any]:
+def check_ifc_file(ifc_path: str, detailed: bool = True) -> Dict[str, Any]:
     """
     Check an IFC file for fire safety compliance.
     
@@ -18,15 +23,63 @@ def check_ifc_file(ifc_path: str) -> Dict[str, Any]:
     
     Args:
         ifc_path: Path to the IFC file to check
+        detailed: If False, only count elements (`scan_ifc_counts_only`):
+            same verdict, without the space/door detail extraction
         
     Returns:
         Dictionary with:
         - compliant: bool (True if file opens and has >=1 space)
         - color: str ("green" if compliant, "red" otherwise)
-        - details: dict (the complete scan output from scan_ifc_basic)
+        - details: dict (the scan output: scan_ifc_basic, or the counts-only
+          scan when detailed is False)
+    
+    Successful results are cached in memory per `source_fingerprint` (path,
+    mtime, size, '.rdb' stamp), on top of the on-disk scan cache, so repeated checks of an unchanged file in the same
+    process skip both the scan and the cache read. Each call returns its
+    own copy.
     """
-    # Perform basic scan
-    scan_results = scan_ifc_basic(ifc_path)
+    try:
+        fingerprint = source_fingerprint(ifc_path)
+    except OSError:
+        # Missing/unreadable file: nothing to key on, report the scan error
+        return _check_ifc_file_uncached(ifc_path, detailed)
+    
+    try:
+        result = _check_ifc_file_cached(fingerprint, detailed)
+    except _UncachedResult as e:
+        # Fresh error result, owned by this call: no copy needed
+        return e.result
+    return copy.deepcopy(result)
+
+
+class _UncachedResult(Exception):
+    """Carries a check result that must not be memoized (scan error)."""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__()
+        self.result = result
+
+
+@lru_cache(maxsize=128)
+def _check_ifc_file_cached(fingerprint: tuple, detailed: bool) -> Dict[str, Any]:
+    result = _check_ifc_file_uncached(fingerprint[0], detailed)
+    if 'error' in result['details']:
+        # Same policy as the on-disk cache: errors (e.g. a permissions
+        # failure, which leaves mtime/size unchanged) are retried next call.
+        # lru_cache does not memoize exceptions.
+        raise _UncachedResult(result)
+    return result
+
+
+def _check_ifc_file_uncached(ifc_path: str, detailed: bool) -> Dict[str, Any]:
+    if not detailed:
+        scan_results = scan_ifc_counts_only(ifc_path)
+    else:
+        # Perform basic scan, unless this version of the file was already scanned
+        scan_results = load_scan(ifc_path)
+        if scan_results is None:
+            scan_results = scan_ifc_basic(ifc_path)
+            store_scan(ifc_path, scan_results)
     
     # Determine compliance
     has_error = 'error' in scan_results
@@ -40,3 +93,25 @@ def check_ifc_file(ifc_path: str) -> Dict[str, Any]:
         'color': color,
         'details': scan_results
     }
+
+
+def check_ifc_files(paths: List[str], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Check several IFC files in parallel, one worker process per file.
+    
+    Each scan is independent and holds its own heavy ifcopenshell state, so
+    processes (not threads) are used and bulk runs scale with the cores.
+    
+    Args:
+        paths: Paths to the IFC files to check
+        workers: Number of worker processes (default: os.cpu_count())
+        
+    Returns:
+        List of `check_ifc_file` results, in the same order as `paths`
+    """
+    if len(paths) <= 1:
+        return [check_ifc_file(path) for path in paths]
+    
+    max_workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(check_ifc_file, paths, chunksize=1))
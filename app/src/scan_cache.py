@@ -0,0 +1,115 @@
+"""
+Scan Cache module
+
+Persists `scan_ifc_basic` results on disk so that checking the same IFC
+again (in this or a later session) skips re-parsing it.
+
+Entries are keyed by SCAN_CACHE_VERSION and `source_fingerprint` (absolute
+path, st_mtime_ns, st_size and the stamp of a usable '.rdb' store):
+re-exporting a model to the same path, converting it, or upgrading the
+scanner invalidates its entry automatically. Only successful
+scans are stored, and the oldest entries are pruned once the cache holds
+more than `MAX_ENTRIES`. Any cache failure (read-only home, corrupt file)
+is treated as a miss; it never breaks a check.
+
+The database lives at `$AFCC_SCAN_CACHE` if set (one of `CACHE_DISABLED`,
+e.g. "off", turns the cache off), else under `$XDG_CACHE_HOME` (default
+`~/.cache`) as `afcc/scan_cache.sqlite3`. It is resolved on every call, so
+worker processes follow the environment they inherit.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .si1_scanner import source_fingerprint
+
+# AFCC_SCAN_CACHE values (lowercased) that disable the cache
+CACHE_DISABLED = frozenset({"", "0", "off", "false", "no", "none"})
+MAX_ENTRIES = 256
+# Bump whenever the output of `scan_ifc_basic` changes: entries written by
+# an older scanner then stop matching instead of being served stale
+SCAN_CACHE_VERSION = 2
+
+
+def _cache_key(ifc_path: str) -> str:
+    abs_path, mtime_ns, size, rdb_stamp = source_fingerprint(ifc_path)
+    return f"v{SCAN_CACHE_VERSION}|{abs_path}|{mtime_ns}|{size}|{rdb_stamp}"
+
+
+def cache_path() -> Optional[Path]:
+    """Location of the cache database, or None if the cache is disabled."""
+    override = os.environ.get("AFCC_SCAN_CACHE")
+    if override is not None:
+        if override.strip().lower() in CACHE_DISABLED:
+            return None
+        return Path(override).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "afcc" / "scan_cache.sqlite3"
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS scans ("
+        "key TEXT PRIMARY KEY, blob BLOB NOT NULL, last_used REAL NOT NULL)"
+    )
+    return conn
+
+
+def load_scan(ifc_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached scan for the current version of `ifc_path`, or None.
+    """
+    path = cache_path()
+    if path is None:
+        return None
+    try:
+        key = _cache_key(ifc_path)
+        conn = _connect(path)
+        try:
+            with conn:
+                row = conn.execute("SELECT blob FROM scans WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE scans SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error, ValueError):
+        return None
+
+
+def store_scan(ifc_path: str, scan_results: Dict[str, Any]) -> None:
+    """
+    Cache `scan_results` for the current version of `ifc_path`.
+
+    Scans that carry an 'error' are not cached.
+    """
+    path = cache_path()
+    if 'error' in scan_results or path is None:
+        return
+    try:
+        key = _cache_key(ifc_path)
+        blob = json.dumps(scan_results, default=str)
+        conn = _connect(path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scans (key, blob, last_used) VALUES (?, ?, ?)",
+                    (key, blob, time.time()),
+                )
+                # LRU pruning: keep the MAX_ENTRIES most recently used
+                conn.execute(
+                    "DELETE FROM scans WHERE key NOT IN "
+                    "(SELECT key FROM scans ORDER BY last_used DESC LIMIT ?)",
+                    (MAX_ENTRIES,),
+                )
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error, TypeError, ValueError):
+        pass
@@ -7,15 +7,51 @@ Scans IFC files for fire safety relevant information including:
 - Data quality metrics
 """
 
-from typing import Dict, List, Any, Optional
+import logging
+import os
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, List, Any, Optional, Tuple
 import ifcopenshell
+from ifcopenshell.util.element import get_psets, get_type
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+
+# Positional attribute indices, shared by IFC2X3 and IFC4.
+# entity[i] skips the by-name schema lookup of entity.Name.
+_IX_GLOBAL_ID = 0      # IfcRoot.GlobalId
+_IX_NAME = 2           # IfcRoot.Name
+_IX_OBJECT_TYPE = 4    # IfcObject.ObjectType
+_IX_LONG_NAME = 7      # IfcSpatialStructureElement / IfcSpatialElement.LongName
+
+# Counts / data quality reported when a file cannot be scanned
+_EMPTY_COUNTS = {
+    'IfcSpace': 0,
+    'IfcDoor': 0,
+    'IfcWall': 0,
+    'IfcBuildingStorey': 0
+}
+_EMPTY_DATA_QUALITY = {
+    'has_spaces': False,
+    'has_storeys': False,
+    'has_fire_ratings_doors': False
+}
+
+# JSON-native property value types (exact types: a set lookup on type(x)
+# is cheaper than isinstance with a tuple, and subclasses are not expected)
+_SCALAR_TYPES = frozenset({str, int, float, bool})
+
+# Quantity names (lowercased) accepted as a space's area
+_AREA_QTY_NAMES = frozenset({'grossfloorarea', 'area', 'netfloorarea'})
+
 
 def get_pset_value(
     element: ifcopenshell.entity_instance, 
     pset_name: str, 
-    prop_name: str
+    prop_name: str,
+    psets_cache: Optional[Dict[int, Dict[str, Any]]] = None
 ) -> Optional[Any]:
     """
     Safely retrieve a property value from an element's property set.
@@ -24,55 +60,67 @@ def get_pset_value(
         element: ifcopenshell element instance
         pset_name: Name of the property set (e.g., 'Pset_DoorCommon')
         prop_name: Name of the property within the set
+        psets_cache: Optional dict of element id -> get_psets() result, so
+            each element's property relations are only walked once per scan
         
     Returns:
         Property value if found, None otherwise
     """
     try:
-        # Use ifcopenshell utility to get all property sets
-        from ifcopenshell.util.element import get_psets
+        if psets_cache is None:
+            psets = get_psets(element)
+        else:
+            element_id = element.id()
+            psets = psets_cache.get(element_id)
+            if psets is None:
+                psets = psets_cache[element_id] = get_psets(element)
         
-        psets = get_psets(element)
-        if pset_name in psets:
-            pset_properties = psets[pset_name]
-            if prop_name in pset_properties:
-                return pset_properties[prop_name]
-    except Exception:
-        # Gracefully handle any errors accessing property sets
+        pset_properties = psets.get(pset_name)
+        if pset_properties and prop_name in pset_properties:
+            return pset_properties[prop_name]
+    except (AttributeError, RuntimeError, KeyError):
+        # Gracefully handle malformed property sets
         pass
     
     return None
 
 
-def get_storey_of_element(element: ifcopenshell.entity_instance) -> Optional[str]:
+def build_storey_index(ifc_file: ifcopenshell.file) -> Dict[int, str]:
     """
-    Get the storey name that spatially contains this element.
+    Map every element below a storey to that storey's name, in one sweep.
     
-    Uses IfcRelContainedInSpatialStructure to find the parent storey.
+    Reads IfcRelContainedInSpatialStructure and IfcRelAggregates once and
+    propagates each storey's name down the spatial tree, so spaces, their
+    sub-spaces and the elements contained in them all resolve in O(1).
     
     Args:
-        element: ifcopenshell element instance
+        ifc_file: Opened ifcopenshell file
         
     Returns:
-        Storey name if found, None otherwise
+        Dict of element id -> storey name ('Unknown' for unnamed storeys)
     """
-    try:
-        # Query for spatial containment relationships
-        ifc_file = element.file
-        
-        for rel in ifc_file.by_type('IfcRelContainedInSpatialStructure'):
-            if element in rel.RelatedElements:
-                container = rel.RelatingStructure
-                
-                # Check if container is a storey
-                if container.is_a() == 'IfcBuildingStorey':
-                    storey_name = container.Name
-                    return storey_name if storey_name else 'Unknown'
-    except Exception:
-        # Gracefully handle any errors
-        pass
+    children: Dict[int, List[ifcopenshell.entity_instance]] = defaultdict(list)
+    for rel in ifc_file.by_type('IfcRelContainedInSpatialStructure'):
+        if rel.RelatingStructure is not None:
+            children[rel.RelatingStructure.id()].extend(rel.RelatedElements or ())
+    for rel in ifc_file.by_type('IfcRelAggregates'):
+        if rel.RelatingObject is not None:
+            children[rel.RelatingObject.id()].extend(rel.RelatedObjects or ())
     
-    return None
+    index: Dict[int, str] = {}
+    for storey in ifc_file.by_type('IfcBuildingStorey'):
+        storey_name = storey.Name or 'Unknown'
+        stack = list(children.get(storey.id(), ()))
+        while stack:
+            child = stack.pop()
+            child_id = child.id()
+            # Nested storeys label their own subtree
+            if child_id in index or child.is_a('IfcBuildingStorey'):
+                continue
+            index[child_id] = storey_name
+            stack.extend(children.get(child_id, ()))
+    
+    return index
 
 
 def _safe_get_attribute(element: ifcopenshell.entity_instance, attr_name: str) -> Optional[Any]:
@@ -86,13 +134,55 @@ def _safe_get_attribute(element: ifcopenshell.entity_instance, attr_name: str) -
     Returns:
         Attribute value if exists, None otherwise
     """
+    # EAFP: a hasattr() check would do the schema lookup twice
     try:
-        if hasattr(element, attr_name):
-            return getattr(element, attr_name)
-    except Exception:
-        pass
+        return getattr(element, attr_name)
+    except (AttributeError, RuntimeError):
+        return None
+
+
+def _type_fire_rating(
+    type_obj: ifcopenshell.entity_instance,
+    psets_cache: Optional[Dict[int, Dict[str, Any]]] = None
+) -> Optional[Any]:
+    """
+    Fire rating declared on a door type: Pset_DoorCommon first, then a
+    direct FireRating attribute as a last resort.
+    """
+    fire_rating = get_pset_value(type_obj, 'Pset_DoorCommon', 'FireRating', psets_cache)
+    if fire_rating is None:
+        fire_rating = _safe_get_attribute(type_obj, 'FireRating')
+    return fire_rating
+
+
+def build_door_type_ratings(
+    ifc_file: ifcopenshell.file,
+    psets_cache: Optional[Dict[int, Dict[str, Any]]] = None
+) -> Dict[int, Optional[Any]]:
+    """
+    Resolve the fire rating of every door type once per scan.
     
-    return None
+    Many doors share a handful of types, so this replaces one type-pset
+    lookup per door with one per distinct IfcDoorType / IfcDoorStyle.
+    
+    Args:
+        ifc_file: Opened ifcopenshell file
+        psets_cache: Optional psets cache, as in `get_pset_value`
+        
+    Returns:
+        Dict of type id -> fire rating (None when the type declares none)
+    """
+    ratings: Dict[int, Optional[Any]] = {}
+    # IfcDoorStyle is IFC2X3 (deprecated in IFC4), IfcDoorType is IFC4+
+    for type_class in ('IfcDoorType', 'IfcDoorStyle'):
+        try:
+            door_types = ifc_file.by_type(type_class)
+        except RuntimeError:
+            # Class not in this file's schema
+            continue
+        for type_obj in door_types:
+            ratings[type_obj.id()] = _type_fire_rating(type_obj, psets_cache)
+    return ratings
 
 
 def _get_quantity_area(element: ifcopenshell.entity_instance) -> Optional[float]:
@@ -111,17 +201,262 @@ def _get_quantity_area(element: ifcopenshell.entity_instance) -> Optional[float]
         
         for qty in element.Quantities:
             qty_name = _safe_get_attribute(qty, 'Name')
-            if qty_name and qty_name.lower() in ['grossfloorarea', 'area', 'netfloorarea']:
+            if qty_name and qty_name.lower() in _AREA_QTY_NAMES:
                 area_value = _safe_get_attribute(qty, 'AreaValue')
                 if area_value is not None:
                     return float(area_value)
-    except Exception:
+    except (AttributeError, RuntimeError, TypeError, ValueError):
         pass
     
     return None
 
 
-def scan_ifc_basic(ifc_path: str) -> Dict[str, Any]:
+def rdb_sibling_path(ifc_path: str) -> Path:
+    """RocksDB twin of an IFC-SPF file: same path with a '.rdb' suffix."""
+    return Path(ifc_path).with_suffix('.rdb')
+
+
+def _rdb_stamp(rdb_path: Path) -> Optional[Tuple[int, int]]:
+    """
+    (newest mtime in ns, total size) of the SST tables of a RocksDB store.
+    
+    The converted model lives in the '*.sst' files; merely opening the
+    store rotates its logs, manifest and options files (and so bumps the
+    directory mtime), so only the tables say when the data was written.
+    None if `rdb_path` is not a readable store with tables.
+    """
+    try:
+        tables = [entry.stat() for entry in os.scandir(rdb_path) if entry.name.endswith('.sst')]
+    except OSError:
+        return None
+    if not tables:
+        return None
+    return max(st.st_mtime_ns for st in tables), sum(st.st_size for st in tables)
+
+
+def _rdb_sibling_state(ifc_path: str, ifc_mtime_ns: int) -> Tuple[Optional[Path], Optional[Tuple[int, int]]]:
+    """
+    (sibling '.rdb' path or None if there is none, its stamp if usable).
+    
+    The sibling is only usable when its tables are at least as new as the
+    SPF file: a model re-exported after the conversion must be parsed again.
+    """
+    rdb_path = rdb_sibling_path(ifc_path)
+    if not rdb_path.is_dir():
+        return None, None
+    stamp = _rdb_stamp(rdb_path)
+    if stamp is None or stamp[0] < ifc_mtime_ns:
+        return rdb_path, None
+    return rdb_path, stamp
+
+
+def source_fingerprint(ifc_path: str) -> Tuple[str, int, int, Optional[Tuple[int, int]]]:
+    """
+    Cache key for whatever `open_ifc_model(ifc_path)` reads.
+    
+    (absolute path, mtime in ns, size, RocksDB stamp or None): the stamp is
+    that of `ifc_path` itself when it is a '.rdb' store, or of the sibling
+    '.rdb' when it will be used, so converting, refreshing or deleting the
+    store also changes the key.
+    
+    Raises OSError if `ifc_path` cannot be stat'ed.
+    """
+    st = os.stat(ifc_path)
+    abs_path = os.path.abspath(ifc_path)
+    if Path(ifc_path).suffix.lower() == '.rdb':
+        return abs_path, st.st_mtime_ns, st.st_size, _rdb_stamp(Path(ifc_path))
+    _, stamp = _rdb_sibling_state(ifc_path, st.st_mtime_ns)
+    return abs_path, st.st_mtime_ns, st.st_size, stamp
+
+
+def open_ifc_model(ifc_path: str) -> ifcopenshell.file:
+    """
+    Open an IFC model, preferring the RocksDB backend when available.
+    
+    `ifc_path` may itself be a '.rdb' store; otherwise a sibling '.rdb'
+    (e.g. written by `ifcopenshell.convert_path_to_rocksdb`) is tried first
+    if it is not older than the SPF file, falling back to parsing the SPF
+    file when it is missing, stale or cannot be read by this ifcopenshell
+    build. The checks here are read-only, which suits the RocksDB path.
+    """
+    path = Path(ifc_path)
+    if path.suffix.lower() != '.rdb':
+        rdb_path, stamp = _rdb_sibling_state(ifc_path, os.stat(path).st_mtime_ns)
+        if rdb_path is not None and stamp is None:
+            logger.warning("%s is older than %s, parsing %s instead", rdb_path, path, path)
+        elif rdb_path is not None:
+            try:
+                return ifcopenshell.open(rdb_path)
+            except (OSError, RuntimeError, ifcopenshell.Error):
+                logger.warning("Could not open %s, parsing %s instead", rdb_path, path, exc_info=True)
+    return ifcopenshell.open(path)
+
+
+def _error_result(file_name: str, message: str) -> Dict[str, Any]:
+    """Result dict for a scan that failed, with empty lists and zero counts."""
+    return {
+        'file_name': file_name,
+        'error': message,
+        'spaces': [],
+        'doors': [],
+        'counts': dict(_EMPTY_COUNTS),
+        'data_quality': dict(_EMPTY_DATA_QUALITY)
+    }
+
+
+def _query_elements(ifc_file: ifcopenshell.file) -> Tuple[tuple, tuple, Dict[str, int]]:
+    """
+    The `by_type` phase shared by the full scan and the counts-only scan.
+    
+    Returns:
+        (spaces, doors, counts) where counts has the four reported types
+    """
+    spaces = ifc_file.by_type('IfcSpace')
+    doors = ifc_file.by_type('IfcDoor')
+    counts = {
+        'IfcSpace': len(spaces),
+        'IfcDoor': len(doors),
+        # Only counted: these tuples are freed right away
+        'IfcWall': len(ifc_file.by_type('IfcWall')),
+        'IfcBuildingStorey': len(ifc_file.by_type('IfcBuildingStorey'))
+    }
+    return spaces, doors, counts
+
+
+def _extract_spaces(ifc_file: ifcopenshell.file, spaces) -> List[Dict[str, Any]]:
+    """Detail entries for the first 20 spaces."""
+    # Element id -> storey name, built once for the whole file
+    storey_index = build_storey_index(ifc_file)
+    
+    space_list: List[Dict[str, Any]] = []
+    for space in islice(spaces, 20):
+        storey_name = storey_index.get(space.id())
+        area = _get_quantity_area(space)
+        
+        # All four are IfcSpace schema attributes: read them by position and
+        # only fall back to per-attribute lookups for malformed entities
+        try:
+            guid, name = space[_IX_GLOBAL_ID], space[_IX_NAME]
+            long_name, object_type = space[_IX_LONG_NAME], space[_IX_OBJECT_TYPE]
+        except (AttributeError, IndexError, RuntimeError):
+            guid = _safe_get_attribute(space, 'GlobalId')
+            name = _safe_get_attribute(space, 'Name')
+            long_name = _safe_get_attribute(space, 'LongName')
+            object_type = _safe_get_attribute(space, 'ObjectType')
+        
+        space_entry = {
+            'guid': guid,
+            'name': name or 'Unnamed',
+            'long_name': long_name,
+            'object_type': object_type,
+            'storey_name': storey_name,
+            'area': area
+        }
+        space_list.append(space_entry)
+    
+    return space_list
+
+
+def _extract_doors(ifc_file: ifcopenshell.file, doors) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Detail entries for the first 20 doors.
+    
+    Returns:
+        (door_list, fire_rating_count)
+    """
+    door_list: List[Dict[str, Any]] = []
+    fire_rating_count = 0
+    # Door types are shared by many doors: resolve each type's rating once
+    psets_cache: Dict[int, Dict[str, Any]] = {}
+    type_ratings = build_door_type_ratings(ifc_file, psets_cache)
+    
+    for door in islice(doors, 20):
+        # Door's own psets: one get_psets per door, not kept in the cache
+        # since no other door will ask for them
+        fire_rating = get_pset_value(door, 'Pset_DoorCommon', 'FireRating')
+        
+        # If not found, use the rating precomputed for the door's type
+        # (get_type reads IsTypedBy in IFC4, IfcRelDefinesByType in IFC2X3)
+        if fire_rating is None:
+            door_type_obj = get_type(door)
+            if door_type_obj is not None:
+                type_id = door_type_obj.id()
+                if type_id not in type_ratings:
+                    # Type class outside IfcDoorType / IfcDoorStyle
+                    type_ratings[type_id] = _type_fire_rating(door_type_obj, psets_cache)
+                fire_rating = type_ratings[type_id]
+        
+        # Fall back to door's own FireRating attribute if present
+        if fire_rating is None:
+            fire_rating = _safe_get_attribute(door, 'FireRating')
+        
+        if fire_rating is not None:
+            # Ensure JSON-serializable value
+            if type(fire_rating) not in _SCALAR_TYPES:
+                fire_rating = str(fire_rating)
+            fire_rating_count += 1
+        
+        # PredefinedType does not exist on IFC2X3 doors (and its position
+        # differs between schemas), so it is the one read by name
+        try:
+            guid, name = door[_IX_GLOBAL_ID], door[_IX_NAME]
+            door_type = door.PredefinedType
+        except (AttributeError, IndexError, RuntimeError):
+            guid = _safe_get_attribute(door, 'GlobalId')
+            name = _safe_get_attribute(door, 'Name')
+            door_type = _safe_get_attribute(door, 'PredefinedType')
+        
+        door_entry = {
+            'guid': guid,
+            'name': name or 'Unnamed',
+            'door_type': door_type or 'Unknown',
+            'fire_rating': fire_rating
+        }
+        door_list.append(door_entry)
+    
+    return door_list, fire_rating_count
+
+
+def scan_ifc_counts_only(ifc_path: str, ifc_file: Optional[ifcopenshell.file] = None) -> Dict[str, Any]:
+    """
+    Fast path of `scan_ifc_basic`: element counts only.
+    
+    Skips the per-space storey/area lookups and the per-door fire-rating
+    chains, for callers that only need the verdict (see `check_ifc_file`).
+    
+    Args:
+        ifc_path: Path to the IFC file
+        ifc_file: Already opened model for `ifc_path`; opened here if None
+        
+    Returns:
+        Dictionary with file_name, counts and (optional) error
+    """
+    file_name = Path(ifc_path).name if ifc_path else "unknown"
+    
+    try:
+        if ifc_file is None:
+            ifc_file = open_ifc_model(ifc_path)
+        _, _, counts = _query_elements(ifc_file)
+    except (OSError, ifcopenshell.Error) as e:
+        # Missing/unreadable/unparsable file: a user error, no traceback
+        logger.warning("Failed to open IFC file %s: %s", ifc_path, e)
+        return {
+            'file_name': file_name,
+            'error': f"Failed to open IFC file: {str(e)}",
+            'counts': dict(_EMPTY_COUNTS)
+        }
+    except Exception as e:
+        logger.exception("Failed to count elements in IFC file %s", ifc_path)
+        return {
+            'file_name': file_name,
+            'error': f"Failed to open IFC file: {str(e)}",
+            'counts': dict(_EMPTY_COUNTS)
+        }
+    
+    return {'file_name': file_name, 'counts': counts}
+
+
+def scan_ifc_basic(ifc_path: str, ifc_file: Optional[ifcopenshell.file] = None) -> Dict[str, Any]:
     """
     Scan an IFC file and extract basic fire safety relevant information.
     
@@ -133,6 +468,7 @@ def scan_ifc_basic(ifc_path: str) -> Dict[str, Any]:
     
     Args:
         ifc_path: Path to the IFC file
+        ifc_file: Already opened model for `ifc_path`; opened here if None
         
     Returns:
         Dictionary with:
@@ -145,132 +481,37 @@ def scan_ifc_basic(ifc_path: str) -> Dict[str, Any]:
     """
     file_name = Path(ifc_path).name if ifc_path else "unknown"
     
-    # Try to open the IFC file
+    # Try to open the IFC file, unless the caller already has it open
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
+        if ifc_file is None:
+            ifc_file = open_ifc_model(ifc_path)
+    except (OSError, ifcopenshell.Error) as e:
+        # Missing/unreadable/unparsable file: a user error, no traceback
+        logger.warning("Failed to open IFC file %s: %s", ifc_path, e)
+        return _error_result(file_name, f"Failed to open IFC file: {str(e)}")
     except Exception as e:
-        return {
-            'file_name': file_name,
-            'error': f"Failed to open IFC file: {str(e)}",
-            'spaces': [],
-            'doors': [],
-            'counts': {
-                'IfcSpace': 0,
-                'IfcDoor': 0,
-                'IfcWall': 0,
-                'IfcBuildingStorey': 0
-            },
-            'data_quality': {
-                'has_spaces': False,
-                'has_storeys': False,
-                'has_fire_ratings_doors': False
-            }
-        }
+        logger.exception("Failed to open IFC file %s", ifc_path)
+        return _error_result(file_name, f"Failed to open IFC file: {str(e)}")
     
     try:
-        # Get all elements of interest
-        spaces = ifc_file.by_type('IfcSpace')
-        doors = ifc_file.by_type('IfcDoor')
-        walls = ifc_file.by_type('IfcWall')
-        storeys = ifc_file.by_type('IfcBuildingStorey')
-        
-        # Extract space details (first 20)
-        space_list: List[Dict[str, Any]] = []
-        for space in spaces[:20]:
-            storey_name = get_storey_of_element(space)
-            area = _get_quantity_area(space)
-            
-            space_entry = {
-                'guid': _safe_get_attribute(space, 'GlobalId'),
-                'name': _safe_get_attribute(space, 'Name') or 'Unnamed',
-                'long_name': _safe_get_attribute(space, 'LongName'),
-                'object_type': _safe_get_attribute(space, 'ObjectType'),
-                'storey_name': storey_name,
-                'area': area
-            }
-            space_list.append(space_entry)
-        
-        # Extract door details (first 20)
-        door_list: List[Dict[str, Any]] = []
-        fire_rating_count = 0
-        
-        for door in doors[:20]:
-            # Try to get fire rating from the door element's property sets first
-            fire_rating = get_pset_value(door, 'Pset_DoorCommon', 'FireRating')
-            
-            # If not found, try the related door type's property sets / attributes
-            if fire_rating is None:
-                try:
-                    is_defined_by = getattr(door, 'IsDefinedBy', None) or []
-                    for rel in is_defined_by:
-                        door_type_obj = getattr(rel, 'RelatingType', None)
-                        if door_type_obj is None:
-                            continue
-                        
-                        # Pset on the type object
-                        fire_rating = get_pset_value(door_type_obj, 'Pset_DoorCommon', 'FireRating')
-                        
-                        # Direct attribute on the type as a last resort
-                        if fire_rating is None:
-                            fire_rating = _safe_get_attribute(door_type_obj, 'FireRating')
-                        
-                        if fire_rating is not None:
-                            break
-                except Exception:
-                    fire_rating = None
-            
-            # Fall back to door's own FireRating attribute if present
-            if fire_rating is None:
-                fire_rating = _safe_get_attribute(door, 'FireRating')
-            
-            if fire_rating is not None:
-                # Ensure JSON-serializable value
-                if not isinstance(fire_rating, (str, int, float, bool)):
-                    fire_rating = str(fire_rating)
-                fire_rating_count += 1
-            
-            door_entry = {
-                'guid': _safe_get_attribute(door, 'GlobalId'),
-                'name': _safe_get_attribute(door, 'Name') or 'Unnamed',
-                'door_type': _safe_get_attribute(door, 'PredefinedType') or 'Unknown',
-                'fire_rating': fire_rating
-            }
-            door_list.append(door_entry)
+        spaces, doors, counts = _query_elements(ifc_file)
+        space_list = _extract_spaces(ifc_file, spaces)
+        door_list, fire_rating_count = _extract_doors(ifc_file, doors)
         
         # Compile results
         return {
             'file_name': file_name,
             'spaces': space_list,
             'doors': door_list,
-            'counts': {
-                'IfcSpace': len(spaces),
-                'IfcDoor': len(doors),
-                'IfcWall': len(walls),
-                'IfcBuildingStorey': len(storeys)
-            },
+            'counts': counts,
             'data_quality': {
-                'has_spaces': len(spaces) > 0,
-                'has_storeys': len(storeys) > 0,
+                'has_spaces': counts['IfcSpace'] > 0,
+                'has_storeys': counts['IfcBuildingStorey'] > 0,
                 'has_fire_ratings_doors': fire_rating_count > 0
             }
         }
     
     except Exception as e:
         # If scanning fails, return error but keep file open result
-        return {
-            'file_name': file_name,
-            'error': f"Error scanning IFC file: {str(e)}",
-            'spaces': [],
-            'doors': [],
-            'counts': {
-                'IfcSpace': 0,
-                'IfcDoor': 0,
-                'IfcWall': 0,
-                'IfcBuildingStorey': 0
-            },
-            'data_quality': {
-                'has_spaces': False,
-                'has_storeys': False,
-                'has_fire_ratings_doors': False
-            }
-        }
+        logger.exception("Error scanning IFC file %s", ifc_path)
+        return _error_result(file_name, f"Error scanning IFC file: {str(e)}")
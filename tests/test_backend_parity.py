@@ -0,0 +1,122 @@
+"""
+Parity checks for the optional accelerated backends.
+
+Each install only runs one backend (numba, scipy/hyperscan/pyahocorasick,
+or the pure Python fallback), so these tests force every available
+`HAS_*` flag in turn and compare the results against the Python path.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+# numba ties cached kernels to the importing module name ("tools.<name>"
+# here), which a direct script run could not import back: keep this
+# session's JIT cache out of tools/__pycache__
+os.environ["NUMBA_CACHE_DIR"] = tempfile.mkdtemp(prefix="afcc-numba-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import checker_si_3_Evacuation_of_occupants_max_route as route  # noqa: E402
+from tools import SI_3_Evacuation_of_occupants as si3  # noqa: E402
+
+
+def _random_grids(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        h, w = rng.integers(1, 25, 2)
+        grid = rng.random((h, w)) < 0.75
+        res = float(0.1 + rng.random())
+        yield rng, grid, res, bool(rng.integers(2))
+
+
+def _assert_same_dist(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    assert (np.isinf(a) == np.isinf(b)).all()
+    finite = np.isfinite(a)
+    # the numba kernel keeps distances in GRID_DIST_DTYPE (float32)
+    np.testing.assert_allclose(a[finite], b[finite], rtol=1e-5, atol=1e-4)
+
+
+ROUTE_BACKENDS = [
+    pytest.param(True, False, id="numba",
+                 marks=pytest.mark.skipif(not route.HAS_NUMBA, reason="numba not installed")),
+    pytest.param(False, True, id="scipy",
+                 marks=pytest.mark.skipif(not route.HAS_SCIPY, reason="scipy not installed")),
+]
+
+
+@pytest.mark.parametrize("has_numba, has_scipy", ROUTE_BACKENDS)
+def test_grid_multisource_dijkstra_backends(monkeypatch, has_numba, has_scipy):
+    monkeypatch.setattr(route, "HAS_NUMBA", has_numba)
+    monkeypatch.setattr(route, "HAS_SCIPY", has_scipy)
+    for rng, grid, res, diagonals in _random_grids():
+        h, w = grid.shape
+        k = int(rng.integers(1, 6))
+        ys = rng.integers(-1, h + 1, k)
+        xs = rng.integers(-1, w + 1, k)
+        costs = np.where(rng.random(k) < 0.3, 0.0, rng.random(k) * 5)
+        seeds = list(zip(ys.tolist(), xs.tolist(), costs.tolist()))
+
+        expected = route._grid_multisource_dijkstra_py(grid, res, seeds, diagonals)
+        got = route.grid_multisource_dijkstra_arrays(grid, res, ys, xs, costs, diagonals)
+        _assert_same_dist(expected, got)
+
+
+@pytest.mark.parametrize("has_numba, has_scipy", ROUTE_BACKENDS)
+def test_door_pair_distances_backends(monkeypatch, has_numba, has_scipy):
+    for rng, grid, res, diagonals in _random_grids(seed=1):
+        h, w = grid.shape
+        cells = [(int(rng.integers(0, h)), int(rng.integers(0, w)))
+                 for _ in range(int(rng.integers(2, 6)))]
+
+        monkeypatch.setattr(route, "HAS_NUMBA", False)
+        monkeypatch.setattr(route, "HAS_SCIPY", False)
+        expected = route.door_pair_distances(grid, res, cells, diagonals)
+
+        monkeypatch.setattr(route, "HAS_NUMBA", has_numba)
+        monkeypatch.setattr(route, "HAS_SCIPY", has_scipy)
+        got = route.door_pair_distances(grid, res, cells, diagonals)
+
+        # only the upper triangle (i < j) is part of the contract
+        upper = np.triu_indices(len(cells), k=1)
+        _assert_same_dist(expected[upper], got[upper])
+
+
+KEYWORDS = {
+    "residencial": ["vivienda", "dormitorio", "casa", "vivienda"],
+    "docente": ["aula", "escuela", "clase"],
+    "comercial": ["tienda", "local", "clase"],
+    "vacia": [],
+    "acentos": ["habitación", "baño", ""],
+}
+
+TEXTS = [
+    "", "vivienda unifamiliar", "aula 3 de la escuela", "local comercial - tienda",
+    "dormitorio principal con baño", "habitación", "clase", "CASA", "casa casa casa",
+    "nada que ver",
+]
+
+SI3_BUILDERS = [
+    pytest.param("_build_hyperscan", id="hyperscan",
+                 marks=pytest.mark.skipif(not si3.HAS_HYPERSCAN, reason="hyperscan not installed")),
+    pytest.param("_build_automaton", id="ahocorasick",
+                 marks=pytest.mark.skipif(not si3.HAS_AHOCORASICK,
+                                          reason="pyahocorasick not installed")),
+    pytest.param("_build_numba", id="numba",
+                 marks=pytest.mark.skipif(not si3.HAS_NUMBA, reason="numba not installed")),
+]
+
+
+@pytest.mark.parametrize("builder", SI3_BUILDERS)
+def test_keyword_matchers(builder):
+    categorias, matcher = getattr(si3, builder)(KEYWORDS)
+    assert categorias == list(KEYWORDS)
+
+    # plain substring reference, one entry per keyword occurrence in the lists
+    por_keyword = si3._indices_por_keyword(KEYWORDS)
+    for texto in TEXTS:
+        expected = sorted(idx for kw, idxs in por_keyword.items() if kw in texto for idx in idxs)
+        assert sorted(matcher(texto)) == expected, texto
@@ -0,0 +1,110 @@
+"""
+Process-wide IFC cache (app/api/ifc_cache.py) and the ETag / 304 path of
+the SI-1 router that relies on its fingerprints.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import ifcopenshell
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import ifc_cache  # noqa: E402
+
+
+def _write_ifc(path, n_spaces):
+    model = ifcopenshell.file(schema="IFC4")
+    for i in range(n_spaces):
+        model.createIfcSpace(ifcopenshell.guid.new(), None, f"Space {i}")
+    model.write(str(path))
+
+
+def _bump_mtime(path, seconds=5):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 1_000_000_000))
+
+
+@pytest.fixture
+def ifc(tmp_path):
+    ifc_cache._open_cached.cache_clear()
+    path = tmp_path / "model.ifc"
+    _write_ifc(path, 2)
+    yield path
+    ifc_cache._open_cached.cache_clear()
+
+
+def test_unchanged_file_reuses_handle(ifc):
+    assert ifc_cache.open_ifc(str(ifc)) is ifc_cache.open_ifc(str(ifc))
+
+
+def test_reexport_to_same_path_gives_new_handle(ifc):
+    first = ifc_cache.open_ifc(str(ifc))
+    _write_ifc(ifc, 3)
+    _bump_mtime(ifc)
+    second = ifc_cache.open_ifc(str(ifc))
+    assert second is not first
+    assert len(second.by_type("IfcSpace")) == 3
+
+
+def test_concurrent_cold_opens_parse_once(ifc, monkeypatch):
+    calls = []
+    real_open = ifcopenshell.open
+
+    def slow_open(path, *args, **kwargs):
+        calls.append(path)
+        time.sleep(0.2)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(ifcopenshell, "open", slow_open)
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(ifc_cache.open_ifc(str(ifc))))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(h is handles[0] for h in handles)
+    assert not ifc_cache._KEY_LOCKS
+
+
+# The router needs the API models, which are not part of every checkout
+@pytest.fixture
+def api():
+    models = pytest.importorskip("app.api.models")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routers import si1_router
+
+    app = FastAPI()
+    app.include_router(si1_router.router)
+    return models, si1_router, TestClient(app)
+
+
+def test_matching_if_none_match_gets_304(api, ifc):
+    models, si1_router, client = api
+    request = models.SI1ComplianceRequest(ifc_path=str(ifc))
+    etag, _ = si1_router._request_etag(request, ifc_cache.file_fingerprint(str(ifc)))
+
+    response = client.post("/check", json=request.model_dump(), headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_config_change_gives_new_etag(api, ifc, tmp_path):
+    models, si1_router, _ = api
+    rules = tmp_path / "rules.json"
+    rules.write_text("{}")
+    request = models.SI1ComplianceRequest(ifc_path=str(ifc), config_path=str(rules))
+    ifc_key = ifc_cache.file_fingerprint(str(ifc))
+    before, _ = si1_router._request_etag(request, ifc_key)
+
+    rules.write_text('{"max_sector_area_m2": 2500}')
+    _bump_mtime(rules)
+    after, _ = si1_router._request_etag(request, ifc_key)
+    assert after != before
@@ -0,0 +1,64 @@
+"""
+A sibling '.rdb' store must never shadow a newer '.ifc' export.
+"""
+
+import os
+import sys
+
+import ifcopenshell
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.src import ifc_checker  # noqa: E402
+from app.src.si1_scanner import scan_ifc_basic, source_fingerprint  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not hasattr(ifcopenshell, "convert_path_to_rocksdb"),
+                                reason="ifcopenshell without RocksDB support")
+
+
+def _write_ifc(path, n_spaces):
+    model = ifcopenshell.file(schema="IFC4")
+    for i in range(n_spaces):
+        model.createIfcSpace(ifcopenshell.guid.new(), None, f"Space {i}")
+    model.write(str(path))
+
+
+def _newest_table_mtime(rdb_path):
+    return max(e.stat().st_mtime_ns for e in os.scandir(rdb_path) if e.name.endswith(".sst"))
+
+
+@pytest.fixture
+def converted(tmp_path, monkeypatch):
+    """t.ifc with 5 spaces, converted to t.rdb; scan cache in tmp_path."""
+    monkeypatch.setenv("AFCC_SCAN_CACHE", str(tmp_path / "scan_cache.sqlite3"))
+    ifc_checker._check_ifc_file_cached.cache_clear()
+    ifc_path = tmp_path / "t.ifc"
+    _write_ifc(ifc_path, 5)
+    ifcopenshell.convert_path_to_rocksdb(str(ifc_path), str(tmp_path / "t.rdb"))
+    return ifc_path
+
+
+def _reexport(ifc_path, n_spaces):
+    """Rewrite the SPF file so that it is clearly newer than the store."""
+    _write_ifc(ifc_path, n_spaces)
+    newer = _newest_table_mtime(ifc_path.with_suffix(".rdb")) + 5_000_000_000
+    os.utime(ifc_path, ns=(newer, newer))
+
+
+def test_fresh_rdb_is_used(converted):
+    # Same content either way; the fingerprint shows the store is in play
+    assert source_fingerprint(str(converted))[3] is not None
+    assert scan_ifc_basic(str(converted))["counts"]["IfcSpace"] == 5
+
+
+def test_stale_rdb_is_ignored(converted):
+    _reexport(converted, 2)
+    assert source_fingerprint(str(converted))[3] is None
+    assert scan_ifc_basic(str(converted))["counts"]["IfcSpace"] == 2
+
+
+def test_cached_check_sees_reexport(converted):
+    assert ifc_checker.check_ifc_file(str(converted))["details"]["counts"]["IfcSpace"] == 5
+    _reexport(converted, 2)
+    assert ifc_checker.check_ifc_file(str(converted))["details"]["counts"]["IfcSpace"] == 2
@@ -0,0 +1,88 @@
+"""
+On-disk scan cache: location, hit/miss, invalidation and the no-errors rule.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.src import scan_cache  # noqa: E402
+
+SCAN = {"file_name": "a.ifc", "counts": {"IfcSpace": 3}, "spaces": [], "doors": []}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = tmp_path / "cache" / "scans.sqlite3"
+    monkeypatch.setenv("AFCC_SCAN_CACHE", str(path))
+    return path
+
+
+@pytest.fixture
+def ifc(tmp_path):
+    # Only the file's stat is part of the key; the content is irrelevant
+    path = tmp_path / "a.ifc"
+    path.write_text("ISO-10303-21;\n")
+    return path
+
+
+def test_cache_path_from_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv("AFCC_SCAN_CACHE", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert scan_cache.cache_path() == tmp_path / "afcc" / "scan_cache.sqlite3"
+
+    monkeypatch.setenv("AFCC_SCAN_CACHE", str(tmp_path / "x.sqlite3"))
+    assert scan_cache.cache_path() == tmp_path / "x.sqlite3"
+
+    for value in ("off", "0", ""):
+        monkeypatch.setenv("AFCC_SCAN_CACHE", value)
+        assert scan_cache.cache_path() is None
+
+
+def test_hit_and_miss(db, ifc, tmp_path):
+    assert scan_cache.load_scan(str(ifc)) is None
+    scan_cache.store_scan(str(ifc), SCAN)
+    assert scan_cache.load_scan(str(ifc)) == SCAN
+
+    other = tmp_path / "b.ifc"
+    other.write_text("ISO-10303-21;\n")
+    assert scan_cache.load_scan(str(other)) is None
+
+
+def test_mtime_change_invalidates(db, ifc):
+    scan_cache.store_scan(str(ifc), SCAN)
+    st = ifc.stat()
+    os.utime(ifc, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert scan_cache.load_scan(str(ifc)) is None
+
+
+def test_size_change_invalidates(db, ifc):
+    scan_cache.store_scan(str(ifc), SCAN)
+    st = ifc.stat()
+    with open(ifc, "a") as f:
+        f.write("END-ISO-10303-21;\n")
+    # same mtime: only the size tells the versions apart
+    os.utime(ifc, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert scan_cache.load_scan(str(ifc)) is None
+
+
+def test_version_bump_invalidates(db, ifc, monkeypatch):
+    scan_cache.store_scan(str(ifc), SCAN)
+    monkeypatch.setattr(scan_cache, "SCAN_CACHE_VERSION", scan_cache.SCAN_CACHE_VERSION + 1)
+    assert scan_cache.load_scan(str(ifc)) is None
+
+
+def test_error_results_are_not_stored(db, ifc):
+    scan_cache.store_scan(str(ifc), dict(SCAN, error="Failed to open IFC file"))
+    assert scan_cache.load_scan(str(ifc)) is None
+
+
+def test_disabled_cache_touches_nothing(tmp_path, ifc, monkeypatch):
+    monkeypatch.setenv("AFCC_SCAN_CACHE", "off")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    scan_cache.store_scan(str(ifc), SCAN)
+    assert scan_cache.load_scan(str(ifc)) is None
+    assert not (tmp_path / "xdg").exists()
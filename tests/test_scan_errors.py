@@ -0,0 +1,28 @@
+"""
+Missing or unparsable IFC files are user errors: one warning, no traceback.
+"""
+
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.src.si1_scanner import scan_ifc_basic, scan_ifc_counts_only  # noqa: E402
+
+
+@pytest.mark.parametrize("scan", [scan_ifc_basic, scan_ifc_counts_only])
+@pytest.mark.parametrize("content", [None, "garbage"], ids=["missing", "unparsable"])
+def test_open_failure_logs_warning_without_traceback(scan, content, tmp_path, caplog):
+    path = tmp_path / "model.ifc"
+    if content is not None:
+        path.write_text(content)
+
+    with caplog.at_level(logging.WARNING, logger="app.src.si1_scanner"):
+        result = scan(str(path))
+
+    assert result["error"].startswith("Failed to open IFC file")
+    assert [r.levelno for r in caplog.records] == [logging.WARNING]
+    assert caplog.records[0].exc_info is None
@@ -3,22 +3,61 @@
 # ─────────────────────────────────────────────
 import ifcopenshell
 import ifcopenshell.util.element as element_util
-from collections import Counter
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+import copy
+import weakref
 import math
+import ntpath
+import numpy as np
 import json
 import os
+import sys
 import glob
+import re
+
+try:
+    import ahocorasick  # pyahocorasick (optional): single-pass keyword matching
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+try:
+    import hyperscan  # python-hyperscan (optional): SIMD multi-literal scan
+    HAS_HYPERSCAN = True
+except ImportError:
+    HAS_HYPERSCAN = False
+
+try:
+    from numba import njit  # numba (optional): compiled substring loops
+    from numba import types as nb_types
+    from numba.typed import List as NumbaList
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
 
 # ─────────────────────────────────────────────
 # DATA LOADERS - Load keywords and regulations from JSON files
 # ─────────────────────────────────────────────
 
+# Loaders are memoized per process: the data/ JSON files are read and parsed
+# once. Returned dicts are shared between callers and must not be modified.
+
+@lru_cache(maxsize=None)
 def get_project_root():
     """Returns the project root directory (parent of utils/)."""
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
+@lru_cache(maxsize=None)
+def _glob_data_files(directory, pattern):
+    """Cached glob of `pattern` inside `directory` (tuple of paths)."""
+    return tuple(glob.glob(os.path.join(directory, pattern)))
+
+
+@lru_cache(maxsize=None)
 def load_keywords(language="auto"):
     """
     Load typology keywords from JSON files.
@@ -27,53 +66,70 @@ def load_keywords(language="auto"):
         language: Language code ('es', 'en', 'fr') or 'auto' to merge all.
 
     Returns:
-        dict with 'typology_keywords' and 'space_density_keywords'.
+        dict with 'typology_keywords' and 'space_density_keywords', plus
+        '*_lower' copies with every keyword lowercased for matching against
+        lowercased IFC texts and 'space_density_patterns' (one compiled
+        regex per density category). Cached and shared: treat as read-only.
     """
     keywords_dir = os.path.join(get_project_root(), "data", "keywords")
 
     if language == "auto":
-        # Merge all keyword files for maximum detection coverage
-        merged_typology = {}
-        merged_density = {}
-
-        for filepath in glob.glob(os.path.join(keywords_dir, "keywords_*.json")):
+        # Merge all keyword files for maximum detection coverage; `seen`
+        # tracks the words already merged per category across all files
+        merged_typology = defaultdict(list)
+        merged_density = defaultdict(list)
+        seen_typology = defaultdict(set)
+        seen_density = defaultdict(set)
+
+        for filepath in _glob_data_files(keywords_dir, "keywords_*.json"):
             with open(filepath, "r", encoding="utf-8") as f:
                 data = json.load(f)
 
-            for tipologia, words in data.get("typology_keywords", {}).items():
-                if tipologia not in merged_typology:
-                    merged_typology[tipologia] = []
-                # Add new words without duplicates
-                existing = set(merged_typology[tipologia])
-                for w in words:
-                    if w not in existing:
-                        merged_typology[tipologia].append(w)
-                        existing.add(w)
-
-            for category, words in data.get("space_density_keywords", {}).items():
-                if category not in merged_density:
-                    merged_density[category] = []
-                existing = set(merged_density[category])
-                for w in words:
-                    if w not in existing:
-                        merged_density[category].append(w)
-                        existing.add(w)
-
-        return {
-            "typology_keywords": merged_typology,
-            "space_density_keywords": merged_density,
+            for merged, seen, clave in (
+                    (merged_typology, seen_typology, "typology_keywords"),
+                    (merged_density, seen_density, "space_density_keywords")):
+                for categoria, words in data.get(clave, {}).items():
+                    # Add new words without duplicates
+                    vistas = seen[categoria]
+                    destino = merged[categoria]
+                    for w in words:
+                        if w not in vistas:
+                            vistas.add(w)
+                            destino.append(w)
+
+        keywords_data = {
+            "typology_keywords": dict(merged_typology),
+            "space_density_keywords": dict(merged_density),
         }
     else:
         filepath = os.path.join(keywords_dir, f"keywords_{language}.json")
         if not os.path.exists(filepath):
             raise FileNotFoundError(
                 f"Keywords file not found: {filepath}\n"
-                f"Available: {[os.path.basename(f) for f in glob.glob(os.path.join(keywords_dir, 'keywords_*.json'))]}"
+                f"Available: {[os.path.basename(f) for f in _glob_data_files(keywords_dir, 'keywords_*.json')]}"
             )
         with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
+            keywords_data = json.load(f)
+
+    # Texts are lowercased before matching: lowercase the keywords once here
+    # (as tuples, since the cached result is shared between callers)
+    for clave in ("typology_keywords", "space_density_keywords"):
+        keywords_data[f"{clave}_lower"] = {
+            categoria: tuple(kw.lower() for kw in kws)
+            for categoria, kws in keywords_data.get(clave, {}).items()
+        }
+
+    # Fallback density matcher (no Aho-Corasick): one case-insensitive
+    # alternation per category; categories without keywords never match
+    keywords_data["space_density_patterns"] = {
+        categoria: re.compile("|".join(map(re.escape, kws)), re.IGNORECASE)
+        for categoria, kws in keywords_data.get("space_density_keywords", {}).items()
+        if kws
+    }
+    return keywords_data
 
 
+@lru_cache(maxsize=None)
 def load_regulation(regulation_id):
     """
     Load a regulation from its JSON file.
@@ -82,14 +138,15 @@ def load_regulation(regulation_id):
         regulation_id: ID of the regulation (e.g., 'CTE_DBSI_SI3').
 
     Returns:
-        dict with the full regulation data.
+        dict with the full regulation data (cached and shared: treat as
+        read-only).
     """
     reg_dir = os.path.join(get_project_root(), "data", "regulations")
     filepath = os.path.join(reg_dir, f"{regulation_id}.json")
 
     if not os.path.exists(filepath):
         available = [os.path.splitext(os.path.basename(f))[0]
-                     for f in glob.glob(os.path.join(reg_dir, "*.json"))]
+                     for f in _glob_data_files(reg_dir, "*.json")]
         raise FileNotFoundError(
             f"Regulation file not found: {filepath}\n"
             f"Available regulations: {available}"
@@ -99,17 +156,143 @@ def load_regulation(regulation_id):
         return json.load(f)
 
 
+def _indices_por_keyword(keywords_by_category):
+    """
+    {keyword: [category index, ...]} with one entry per occurrence in the
+    lists, so scores match the nested-loop version. Empty keywords are left
+    out.
+    """
+    por_keyword = {}
+    for idx, categoria in enumerate(keywords_by_category):
+        for kw in keywords_by_category[categoria]:
+            if kw:
+                por_keyword.setdefault(kw, []).append(idx)
+    return por_keyword
+
+
+def _build_automaton(keywords_by_category):
+    """
+    Compiles {category: [keywords]} into one Aho-Corasick automaton.
+
+    Returns (categories, matcher), where matcher(texto) gives the category
+    indices of every distinct keyword present in `texto`.
+    """
+    automaton = ahocorasick.Automaton()
+    for kw, idxs in _indices_por_keyword(keywords_by_category).items():
+        automaton.add_word(kw, (kw, tuple(idxs)))
+    automaton.make_automaton()
+
+    def matcher(texto):
+        encontradas = {}
+        for _, (kw, idxs) in automaton.iter(texto):
+            encontradas[kw] = idxs
+        return [idx for idxs in encontradas.values() for idx in idxs]
+
+    return list(keywords_by_category), matcher
+
+
+def _build_hyperscan(keywords_by_category):
+    """
+    Compiles {category: [keywords]} into one Hyperscan literal database.
+
+    Same (categories, matcher) contract as _build_automaton. Each keyword is
+    reported at most once per text (HS_FLAG_SINGLEMATCH); UTF-8 bytes are
+    scanned, which gives the same substring matches as on str.
+    """
+    por_keyword = _indices_por_keyword(keywords_by_category)
+    idxs_por_id = [tuple(idxs) for idxs in por_keyword.values()]
+
+    if not idxs_por_id:
+        return list(keywords_by_category), lambda texto: []
+
+    db = hyperscan.Database()
+    db.compile(expressions=[kw.encode("utf-8") for kw in por_keyword],
+               ids=list(range(len(idxs_por_id))),
+               elements=len(idxs_por_id),
+               flags=hyperscan.HS_FLAG_SINGLEMATCH,
+               literal=True)
+
+    def matcher(texto):
+        ids = []
+        db.scan(texto.encode("utf-8"),
+                match_event_handler=lambda id_, desde, hasta, flags, ctx: ids.append(id_))
+        return [idx for id_ in ids for idx in idxs_por_id[id_]]
+
+    return list(keywords_by_category), matcher
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _categorias_nb(texto, keywords, offsets, idxs):
+        # Category indices of every keyword contained in `texto`; keyword k
+        # maps to idxs[offsets[k]:offsets[k + 1]]
+        n = 0
+        for k in range(len(keywords)):
+            if keywords[k] in texto:
+                n += offsets[k + 1] - offsets[k]
+        out = np.empty(n, dtype=np.int64)
+        n = 0
+        for k in range(len(keywords)):
+            if keywords[k] in texto:
+                for j in range(offsets[k], offsets[k + 1]):
+                    out[n] = idxs[j]
+                    n += 1
+        return out
+
+
+def _build_numba(keywords_by_category):
+    """
+    Marshals {category: [keywords]} for the compiled _categorias_nb loop.
+
+    Same (categories, matcher) contract as _build_automaton; used when
+    neither Hyperscan nor pyahocorasick is installed.
+    """
+    por_keyword = _indices_por_keyword(keywords_by_category)
+    keywords = NumbaList.empty_list(nb_types.unicode_type)
+    for kw in por_keyword:
+        keywords.append(kw)
+    offsets = np.zeros(len(por_keyword) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(idxs) for idxs in por_keyword.values()])
+    idxs = np.array([idx for idxs in por_keyword.values() for idx in idxs],
+                    dtype=np.int64)
+
+    def matcher(texto):
+        return _categorias_nb(texto, keywords, offsets, idxs).tolist()
+
+    return list(keywords_by_category), matcher
+
+
+@lru_cache(maxsize=None)
+def _keyword_automata(language="auto"):
+    """
+    Cached (typology, density) keyword matchers for load_keywords(language):
+    Hyperscan if installed, else Aho-Corasick, else numba, else (None, None)
+    so callers fall back to plain substring tests.
+    """
+    if HAS_HYPERSCAN:
+        build = _build_hyperscan
+    elif HAS_AHOCORASICK:
+        build = _build_automaton
+    elif HAS_NUMBA:
+        build = _build_numba
+    else:
+        return None, None
+    keywords_data = load_keywords(language)
+    return (build(keywords_data["typology_keywords_lower"]),
+            build(keywords_data["space_density_keywords_lower"]))
+
+
 def list_available_regulations():
     """List all available regulation IDs."""
     reg_dir = os.path.join(get_project_root(), "data", "regulations")
     return [os.path.splitext(os.path.basename(f))[0]
-            for f in glob.glob(os.path.join(reg_dir, "*.json"))]
+            for f in _glob_data_files(reg_dir, "*.json")]
 
 
 def list_available_languages():
     """List all available keyword language codes."""
     keywords_dir = os.path.join(get_project_root(), "data", "keywords")
-    files = glob.glob(os.path.join(keywords_dir, "keywords_*.json"))
+    files = _glob_data_files(keywords_dir, "keywords_*.json")
     return [os.path.basename(f).replace("keywords_", "").replace(".json", "")
             for f in files]
 
@@ -118,18 +301,88 @@ def list_available_languages():
 # FUNCTION 1. Get typology from IFC file (universal, multi-language)
 # ─────────────────────────────────────────────
 
+def _open_ifc(ifc_path):
+    """
+    Opens an IFC file, reusing the parsed model while the file is unchanged
+    (cached by path and modification time). The model is shared: read-only.
+    """
+    return _open_ifc_cached(os.path.abspath(ifc_path), os.stat(ifc_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _open_ifc_cached(ifc_path, mtime_ns):
+    return ifcopenshell.open(ifc_path)
+
+
+# model -> {entity id: get_psets(entity)}; entries die with their model
+_PSETS_CACHE = weakref.WeakKeyDictionary()
+
+
+def _psets(model, entity):
+    """
+    Memoized element_util.get_psets(entity) for an entity of `model`:
+    each element's property sets are built once per model (read-only).
+    """
+    psets_modelo = _PSETS_CACHE.get(model)
+    if psets_modelo is None:
+        psets_modelo = _PSETS_CACHE[model] = {}
+    entity_id = entity.id()
+    psets = psets_modelo.get(entity_id)
+    if psets is None:
+        psets = psets_modelo[entity_id] = element_util.get_psets(entity)
+    return psets
+
+
+@dataclass
+class ModelIndex:
+    """Entity lists of one IFC model used across the SI-3 pipeline."""
+    spaces: list
+    buildings: list
+    storeys: list           # file order
+    storeys_sorted: list    # by elevation (missing elevation = 0.0)
+    spaces_by_storey: dict  # storey id -> spaces aggregated directly under it
+
+
+# model -> ModelIndex; entries die with their model
+_MODEL_INDEX_CACHE = weakref.WeakKeyDictionary()
+
+
+def _model_index(model):
+    """
+    ModelIndex of `model`, built on first use and shared afterwards
+    (read-only).
+    """
+    index = _MODEL_INDEX_CACHE.get(model)
+    if index is None:
+        storeys = model.by_type("IfcBuildingStorey")
+        index = _MODEL_INDEX_CACHE[model] = ModelIndex(
+            spaces=model.by_type("IfcSpace"),
+            buildings=model.by_type("IfcBuilding"),
+            storeys=storeys,
+            storeys_sorted=sorted(storeys, key=lambda s: s.Elevation or 0.0),
+            # Via the inverse IsDecomposedBy index (no scan of every
+            # IfcRelAggregates in the model)
+            spaces_by_storey={
+                storey.id(): [o for rel in storey.IsDecomposedBy
+                              for o in rel.RelatedObjects if o.is_a("IfcSpace")]
+                for storey in storeys
+            },
+        )
+    return index
+
+
 def obtener_espacios_ifc(ifc_path):
     """Extracts names and category descriptions from IFC spaces."""
-    model = ifcopenshell.open(ifc_path)
+    model = _open_ifc(ifc_path)
     espacios = []
 
-    for space in model.by_type("IfcSpace"):
+    for space in _model_index(model).spaces:
         info = {
             "id": space.GlobalId,
             "nombre": space.LongName or space.Name or "",
         }
 
-        for pset in element_util.get_psets(space).values():
+        for pset in _psets(model, space).values():
             if "Category Description" in pset:
                 info["categoria"] = pset["Category Description"]
             if "OmniClass Table 13 Category" in pset:
@@ -143,17 +396,18 @@ def obtener_espacios_ifc(ifc_path):
 def obtener_info_edificio(model):
     """Extracts building information (name, description, category)."""
     info = {}
-    buildings = model.by_type("IfcBuilding")
+    index = _model_index(model)
+    buildings = index.buildings
     if buildings:
         building = buildings[0]
         info["nombre"] = building.Name or ""
         info["descripcion"] = building.Description or ""
 
-        for pset in element_util.get_psets(building).values():
+        for pset in _psets(model, building).values():
             if "Category Description" in pset:
                 info["categoria"] = pset["Category Description"]
 
-    storeys = model.by_type("IfcBuildingStorey")
+    storeys = index.storeys
     info["num_plantas"] = len(storeys)
     info["plantas"] = [
         {"nombre": s.Name or "", "elevacion": s.Elevation or 0.0}
@@ -163,13 +417,15 @@ def obtener_info_edificio(model):
     return info
 
 
-def calcular_puntuacion_tipologia(textos, typology_keywords):
+def calcular_puntuacion_tipologia(textos, typology_keywords, automaton=None):
     """
     Scores each typology based on keyword matches found in the texts.
 
     Args:
         textos: list of strings extracted from IFC.
         typology_keywords: dict {typology_name: [keywords]} from JSON.
+        automaton: optional (categories, matcher) from _keyword_automata for
+            these keywords; scans each text once instead of once per keyword.
 
     Returns:
         Counter with scores per typology.
@@ -177,11 +433,24 @@ def calcular_puntuacion_tipologia(textos, typology_keywords):
     puntuaciones = Counter()
     textos_lower = [t.lower() for t in textos if t]
 
+    if automaton is not None:
+        categorias, matcher = automaton
+        conteo = Counter()
+        for texto in textos_lower:
+            for idx in matcher(texto):
+                conteo[categorias[idx]] += 1
+        # Same insertion order as the nested loops (ties in most_common)
+        for tipologia in typology_keywords:
+            if conteo[tipologia]:
+                puntuaciones[tipologia] = conteo[tipologia]
+        return puntuaciones
+
     for tipologia, keywords in typology_keywords.items():
         for texto in textos_lower:
-            for keyword in keywords:
-                if keyword in texto:
-                    puntuaciones[tipologia] += 1
+            # C-level substring tests, no Python loop per keyword
+            aciertos = sum(map(texto.__contains__, keywords))
+            if aciertos:
+                puntuaciones[tipologia] += aciertos
 
     return puntuaciones
 
@@ -201,9 +470,11 @@ def detectar_tipologia(ifc_path, language="auto"):
 
     Returns:
         dict with detected typology, confidence, and analysis details.
+        "_model" holds the opened IFC model, to be passed on to
+        calcular_ocupacion so the file is only parsed once.
     """
     keywords_data = load_keywords(language)
-    typology_keywords = keywords_data["typology_keywords"]
+    typology_keywords = keywords_data["typology_keywords_lower"]
 
     model, espacios = obtener_espacios_ifc(ifc_path)
     info_edificio = obtener_info_edificio(model)
@@ -223,11 +494,14 @@ def detectar_tipologia(ifc_path, language="auto"):
         textos.append(espacio.get("omniclass", ""))
 
     # From filename
-    nombre_archivo = ifc_path.split("/")[-1].split("\\")[-1]
+    # ntpath splits on both "/" and "\\" on every OS, like the old split chain
+    nombre_archivo = ntpath.basename(ifc_path)
     textos.append(nombre_archivo)
 
     # Calculate scores
-    puntuaciones = calcular_puntuacion_tipologia(textos, typology_keywords)
+    typology_automaton, _ = _keyword_automata(language)
+    puntuaciones = calcular_puntuacion_tipologia(textos, typology_keywords,
+                                                 typology_automaton)
 
     if not puntuaciones:
         return {
@@ -236,6 +510,7 @@ def detectar_tipologia(ifc_path, language="auto"):
             "puntuaciones": {},
             "edificio": info_edificio,
             "num_espacios": len(espacios),
+            "_model": model,
         }
 
     tipologia_detectada = puntuaciones.most_common(1)[0][0]
@@ -250,6 +525,7 @@ def detectar_tipologia(ifc_path, language="auto"):
         "edificio": info_edificio,
         "num_espacios": len(espacios),
         "espacios": espacios,
+        "_model": model,
     }
 
 
@@ -262,6 +538,8 @@ def obtener_reglas(tipologia, regulation_id="CTE_DBSI_SI3"):
     Returns evacuation rules for a given typology from the regulation JSON.
 
     Combines general rules with typology-specific overrides.
+    Results are memoized per (typology, regulation); each call gets its own
+    copy, so callers may modify it freely.
 
     Args:
         tipologia: Detected typology string.
@@ -270,6 +548,12 @@ def obtener_reglas(tipologia, regulation_id="CTE_DBSI_SI3"):
     Returns:
         dict with all applicable rules.
     """
+    return copy.deepcopy(_obtener_reglas_cached(tipologia, regulation_id))
+
+
+@lru_cache(maxsize=64)
+def _obtener_reglas_cached(tipologia, regulation_id):
+    """Builds the merged rules dict for obtener_reglas (shared, do not modify)."""
     regulation = load_regulation(regulation_id)
 
     # Start with general rules
@@ -282,28 +566,34 @@ def obtener_reglas(tipologia, regulation_id="CTE_DBSI_SI3"):
     reglas["tipologia"] = tipologia
     reglas["regulation_id"] = regulation_id
     reglas["regulation_name"] = regulation.get("regulation_name", regulation_id)
+    # Carried along so imprimir_reglas does not reload the regulation
+    reglas["display_categories"] = regulation.get("display_categories", {})
 
     return reglas
 
 
 def imprimir_reglas(reglas, regulation_id="CTE_DBSI_SI3"):
     """Prints evacuation rules in a readable format."""
+    # Built as one string and written once instead of one print per line
+    out = []
     tipologia = reglas.get("tipologia", "Desconocida")
     reg_name = reglas.get("regulation_name", regulation_id)
 
-    print(f"\n{'='*60}")
-    print(f"  EVACUATION RULES - {reg_name}")
-    print(f"  Typology: {tipologia}")
-    print(f"{'='*60}")
+    out.append(f"\n{'='*60}")
+    out.append(f"  EVACUATION RULES - {reg_name}")
+    out.append(f"  Typology: {tipologia}")
+    out.append(f"{'='*60}")
 
-    # Load display categories from regulation JSON
-    regulation = load_regulation(reglas.get("regulation_id", regulation_id))
-    categorias = regulation.get("display_categories", {})
+    # Display categories come with the rules (see obtener_reglas)
+    categorias = reglas.get("display_categories")
+    if categorias is None:
+        regulation = load_regulation(reglas.get("regulation_id", regulation_id))
+        categorias = regulation.get("display_categories", {})
 
     if not categorias:
         # Fallback: print all rules flat
         for clave, valor in reglas.items():
-            if clave in ("tipologia", "regulation_id", "regulation_name"):
+            if clave in ("tipologia", "regulation_id", "regulation_name", "display_categories"):
                 continue
             nombre_legible = clave.replace("_", " ")
             if valor is None:
@@ -312,14 +602,14 @@ def imprimir_reglas(reglas, regulation_id="CTE_DBSI_SI3"):
                 valor = "NO SE ADMITE"
             elif isinstance(valor, float) and valor < 1:
                 valor = f"{valor*100:.0f}%"
-            print(f"    {nombre_legible:<55} {valor}")
+            out.append(f"    {nombre_legible:<55} {valor}")
     else:
         for nombre_cat, claves in categorias.items():
             reglas_cat = {k: reglas[k] for k in claves if k in reglas}
             if not reglas_cat:
                 continue
 
-            print(f"\n  --- {nombre_cat} ---")
+            out.append(f"\n  --- {nombre_cat} ---")
             for clave, valor in reglas_cat.items():
                 nombre_legible = clave.replace("_", " ")
                 if valor is None:
@@ -328,26 +618,40 @@ def imprimir_reglas(reglas, regulation_id="CTE_DBSI_SI3"):
                     valor = "NO SE ADMITE"
                 elif isinstance(valor, float) and valor < 1:
                     valor = f"{valor*100:.0f}%"
-                print(f"    {nombre_legible:<55} {valor}")
+                out.append(f"    {nombre_legible:<55} {valor}")
 
-    print(f"\n{'='*60}")
+    out.append(f"\n{'='*60}")
+
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 # ─────────────────────────────────────────────
 # FUNCTION 3. Calculate occupancy and evaluate compliance
 # ─────────────────────────────────────────────
 
-def obtener_area_espacio(model, space):
-    """Extracts area (m2) of an IfcSpace from its property sets."""
-    for pset in element_util.get_psets(space).values():
-        if "Area" in pset:
-            area = pset["Area"]
+# Space area quantities, in order of preference
+AREA_PROPERTY_NAMES = ("NetFloorArea", "GrossFloorArea", "Area")
+
+
+def obtener_area_espacio(model, space, psets=None):
+    """
+    Extracts area (m2) of an IfcSpace from its property sets.
+
+    Takes the first numeric NetFloorArea (Qto_SpaceBaseQuantities), else
+    GrossFloorArea, else a generic "Area" property; 0.0 if none is found.
+    `psets` lets the caller pass an already computed get_psets(space).
+    """
+    if psets is None:
+        psets = _psets(model, space)
+    for nombre in AREA_PROPERTY_NAMES:
+        for pset in psets.values():
+            area = pset.get(nombre)
             if isinstance(area, (int, float)):
                 return area
     return 0.0
 
 
-def calcular_ocupacion(ifc_path, tipologia, reglas, language="auto",
+def calcular_ocupacion(model, tipologia, reglas, language="auto",
                        regulation_id="CTE_DBSI_SI3"):
     """
     Calculates real occupancy from IFC areas and regulation density values.
@@ -355,7 +659,8 @@ def calcular_ocupacion(ifc_path, tipologia, reglas, language="auto",
     Occupancy per space = ceil(Area / Density)
 
     Args:
-        ifc_path: Path to IFC file.
+        model: Opened IFC model (e.g. detectar_tipologia(...)["_model"]),
+            or a path to the IFC file.
         tipologia: Detected CTE typology.
         reglas: Dict of applicable rules.
         language: Language code for keyword matching.
@@ -364,7 +669,8 @@ def calcular_ocupacion(ifc_path, tipologia, reglas, language="auto",
     Returns:
         dict with total occupancy, per floor, per space, and evacuation height.
     """
-    model = ifcopenshell.open(ifc_path)  # noqa: F841
+    if isinstance(model, (str, os.PathLike)):
+        model = _open_ifc(model)
 
     # Load density map from regulation JSON
     regulation = load_regulation(regulation_id)
@@ -372,86 +678,110 @@ def calcular_ocupacion(ifc_path, tipologia, reglas, language="auto",
 
     # Load space density keywords for matching
     keywords_data = load_keywords(language)
-    space_keywords = keywords_data.get("space_density_keywords", {})
+    space_patterns = keywords_data["space_density_patterns"]
+    _, density_automaton = _keyword_automata(language)
 
     # Default density from typology rules
     densidad_defecto = reglas.get("densidad_ocupacion_m2_persona", 20)
 
-    # Organize spaces by storey
-    storeys = model.by_type("IfcBuildingStorey")
-    storeys_sorted = sorted(storeys, key=lambda s: s.Elevation or 0.0)
+    # Spaces organized by storey
+    index = _model_index(model)
+    storeys_sorted = index.storeys_sorted
+    spaces_by_storey = index.spaces_by_storey
+
+    # Single pass over the spaces: collect area, density and storey index,
+    # occupancy and per-floor sums are then computed on whole arrays
+    areas = []
+    densidades = []
+    storey_idx = []
+    nombres = []
+    categorias_espacio = []
+
+    for i, storey in enumerate(storeys_sorted):
+        for obj in spaces_by_storey.get(storey.id(), ()):
+            nombre_espacio = obj.LongName or obj.Name or ""
+
+            # Area and category (last "Category Description") from the
+            # cached psets
+            psets = _psets(model, obj)
+            area = obtener_area_espacio(model, obj, psets)
+            categoria = ""
+            for pset in psets.values():
+                if "Category Description" in pset:
+                    categoria = pset["Category Description"]
+
+            # Determine density using keyword matching from JSON
+            densidad = densidad_defecto
+            texto_busqueda = f"{categoria} {nombre_espacio}"
+
+            if density_automaton is not None:
+                # First category (in JSON order) with any keyword in the text
+                categorias, matcher = density_automaton
+                idxs = matcher(texto_busqueda.lower())
+                if idxs:
+                    densidad = density_map.get(categorias[min(idxs)],
+                                               densidad_defecto)
+            else:
+                for density_category, patron in space_patterns.items():
+                    if patron.search(texto_busqueda):
+                        densidad = density_map.get(
+                            density_category, densidad_defecto)
+                        break
+
+            areas.append(area)
+            densidades.append(densidad)
+            storey_idx.append(i)
+            nombres.append(nombre_espacio)
+            categorias_espacio.append(categoria)
+
+    # Occupancy = ceil(Area / Density); a missing (None) or zero density is
+    # mapped to inf so those spaces, like zero-area ones, get 0 occupants
+    areas_arr = np.asarray(areas, dtype=float)
+    dens_arr = np.array([d if d else np.inf for d in densidades], dtype=float)
+    ocupantes_arr = np.ceil(areas_arr / dens_arr).astype(np.int64)
+
+    n_plantas = len(storeys_sorted)
+    idx_arr = np.asarray(storey_idx, dtype=np.intp)
+    superficie_por_planta = np.bincount(idx_arr, weights=areas_arr,
+                                        minlength=n_plantas)
+    ocupantes_por_planta = np.bincount(idx_arr, weights=ocupantes_arr,
+                                       minlength=n_plantas)
 
     ocupacion_por_planta = {}
-    espacios_detalle = []
     superficie_total = 0.0
     ocupacion_total = 0
-
-    for storey in storeys_sorted:
-        nombre_planta = storey.Name or "Sin nombre"
-        elevacion = storey.Elevation or 0.0
-        ocupacion_planta = 0
-        superficie_planta = 0.0
-
-        for rel in model.by_type("IfcRelAggregates"):
-            if rel.RelatingObject == storey:
-                for obj in rel.RelatedObjects:
-                    if obj.is_a("IfcSpace"):
-                        area = obtener_area_espacio(model, obj)
-                        nombre_espacio = obj.LongName or obj.Name or ""
-
-                        categoria = ""
-                        for pset in element_util.get_psets(obj).values():
-                            if "Category Description" in pset:
-                                categoria = pset["Category Description"]
-
-                        # Determine density using keyword matching from JSON
-                        densidad = densidad_defecto
-                        cat_lower = categoria.lower()
-                        nombre_lower = nombre_espacio.lower()
-                        texto_busqueda = f"{cat_lower} {nombre_lower}"
-
-                        matched = False
-                        for density_category, kw_list in space_keywords.items():
-                            for kw in kw_list:
-                                if kw in texto_busqueda:
-                                    densidad = density_map.get(
-                                        density_category, densidad_defecto)
-                                    matched = True
-                                    break
-                            if matched:
-                                break
-
-                        # Calculate occupancy
-                        if densidad is None or area == 0:
-                            ocupantes = 0
-                        else:
-                            ocupantes = math.ceil(area / densidad)
-
-                        superficie_planta += area
-                        ocupacion_planta += ocupantes
-
-                        espacios_detalle.append({
-                            "planta": nombre_planta,
-                            "espacio": nombre_espacio,
-                            "categoria": categoria,
-                            "area_m2": round(area, 2),
-                            "densidad_m2_persona": densidad,
-                            "ocupantes": ocupantes,
-                        })
-
+    for i, storey in enumerate(storeys_sorted):
+        superficie_planta = float(superficie_por_planta[i])
+        ocupacion_planta = int(ocupantes_por_planta[i])
         superficie_total += superficie_planta
         ocupacion_total += ocupacion_planta
-        ocupacion_por_planta[nombre_planta] = {
-            "elevacion_m": elevacion,
+        ocupacion_por_planta[storey.Name or "Sin nombre"] = {
+            "elevacion_m": storey.Elevation or 0.0,
             "superficie_m2": round(superficie_planta, 2),
             "ocupantes": ocupacion_planta,
         }
 
+    espacios_detalle = [
+        {
+            "planta": storeys_sorted[i].Name or "Sin nombre",
+            "espacio": nombre,
+            "categoria": categoria,
+            "area_m2": round(area, 2),
+            "densidad_m2_persona": densidad,
+            "ocupantes": int(ocupantes),
+        }
+        for i, nombre, categoria, area, densidad, ocupantes in zip(
+            storey_idx, nombres, categorias_espacio, areas, densidades,
+            ocupantes_arr.tolist())
+    ]
+
     # Calculate evacuation height
-    elevaciones = [s.Elevation or 0.0 for s in storeys_sorted]
-    planta_salida = min(e for e in elevaciones if e >= 0) if any(e >= 0 for e in elevaciones) else 0.0
-    planta_mas_alta = max(elevaciones)
-    planta_mas_baja = min(elevaciones)
+    elevaciones = np.fromiter((s.Elevation or 0.0 for s in storeys_sorted),
+                              dtype=np.float64, count=n_plantas)
+    sobre_rasante = elevaciones >= 0
+    planta_salida = float(elevaciones[sobre_rasante].min()) if sobre_rasante.any() else 0.0
+    planta_mas_alta = float(elevaciones.max())
+    planta_mas_baja = float(elevaciones.min())
     altura_evacuacion_desc = planta_mas_alta - planta_salida
     altura_evacuacion_asc = planta_salida - planta_mas_baja if planta_mas_baja < planta_salida else 0.0
 
@@ -466,176 +796,268 @@ def calcular_ocupacion(ifc_path, tipologia, reglas, language="auto",
     }
 
 
-def evaluar_cumplimiento(ocupacion, reglas):
+def compute_widths(ocup_total, h_asc):
     """
-    Evaluates if the building complies with evacuation rules
-    based on calculated occupancy and typology rules.
+    Minimum evacuation widths (m) for one or many buildings at once.
 
     Args:
-        ocupacion: dict from calcular_ocupacion.
-        reglas: dict from obtener_reglas.
+        ocup_total: occupancy P (scalar or array).
+        h_asc: ascending evacuation height in m (scalar or array).
 
     Returns:
-        list of dicts with each check and its result.
+        dict of float arrays (0-d for scalar input), broadcast together:
+        'puerta' max(P/200, 0.80), 'pasillo' max(P/200, 1.00),
+        'esc_desc' P/160 and 'esc_asc' P/(160-10h), inf where 160-10h <= 0.
     """
-    verificaciones = []
+    P = np.asarray(ocup_total, dtype=np.float64)
+    divisor = 160 - 10 * np.asarray(h_asc, dtype=np.float64)
+    esc_asc = np.full(np.broadcast(P, divisor).shape, np.inf)
+    np.divide(P, divisor, out=esc_asc, where=divisor > 0)
+    return {
+        "puerta": np.maximum(P / 200, 0.80),
+        "pasillo": np.maximum(P / 200, 1.00),
+        "esc_desc": P / 160,
+        "esc_asc": esc_asc,
+    }
+
+
+# Compliance checks: each takes (ocupacion, reglas) and returns the check
+# dict, or None when it does not apply. A new check is one more function
+# appended to REGLAS_CUMPLIMIENTO; evaluar_cumplimiento keeps their order.
+
+def _regla_ocupacion_1_salida(ocupacion, reglas):
+    """1. Max occupancy with single exit."""
+    max_1_salida = reglas.get("ocupacion_max_1_salida", 100)
+    if max_1_salida is None:
+        return None
     ocup_total = ocupacion["ocupacion_total"]
+    cumple = ocup_total <= max_1_salida
+    return {
+        "regla": f"Ocupacion max. con 1 salida ({max_1_salida} pers.)",
+        "valor_edificio": f"{ocup_total} personas",
+        "limite": f"{max_1_salida} personas",
+        "resultado": "CUMPLE" if cumple else "NO CUMPLE - Se requieren mas salidas",
+    }
+
+
+def _regla_altura_desc_1_salida(ocupacion, reglas):
+    """2. Max descending evacuation height (single exit)."""
+    h_max = reglas.get("altura_evacuacion_desc_max_1_salida_m")
+    if h_max is None:
+        return None
     h_desc = ocupacion["altura_evacuacion_descendente_m"]
+    cumple = h_desc <= h_max
+    return {
+        "regla": f"Altura evacuacion descendente max. con 1 salida ({h_max} m)",
+        "valor_edificio": f"{h_desc} m",
+        "limite": f"{h_max} m",
+        "resultado": "CUMPLE" if cumple else "NO CUMPLE - Se requieren mas salidas",
+    }
+
+
+def _regla_altura_asc_1_salida(ocupacion, reglas):
+    """3. Max ascending evacuation height (single exit)."""
     h_asc = ocupacion["altura_evacuacion_ascendente_m"]
-    tipologia = reglas.get("tipologia", "")
+    if not h_asc > 0:
+        return None
+    h_max_asc = reglas.get("altura_evacuacion_asc_max_1_salida_m", 10)
+    cumple = h_asc <= h_max_asc
+    return {
+        "regla": f"Altura evacuacion ascendente max. con 1 salida ({h_max_asc} m)",
+        "valor_edificio": f"{h_asc} m",
+        "limite": f"{h_max_asc} m",
+        "resultado": "CUMPLE" if cumple else "NO CUMPLE",
+    }
 
-    # 1. Max occupancy with single exit
-    max_1_salida = reglas.get("ocupacion_max_1_salida", 100)
-    if max_1_salida is not None:
-        cumple = ocup_total <= max_1_salida
-        verificaciones.append({
-            "regla": f"Ocupacion max. con 1 salida ({max_1_salida} pers.)",
-            "valor_edificio": f"{ocup_total} personas",
-            "limite": f"{max_1_salida} personas",
-            "resultado": "CUMPLE" if cumple else "NO CUMPLE - Se requieren mas salidas",
-        })
 
-    # 2. Max descending evacuation height (single exit)
-    h_max = reglas.get("altura_evacuacion_desc_max_1_salida_m")
-    if h_max is not None:
-        cumple = h_desc <= h_max
-        verificaciones.append({
-            "regla": f"Altura evacuacion descendente max. con 1 salida ({h_max} m)",
-            "valor_edificio": f"{h_desc} m",
-            "limite": f"{h_max} m",
-            "resultado": "CUMPLE" if cumple else "NO CUMPLE - Se requieren mas salidas",
-        })
-
-    # 3. Max ascending evacuation height (single exit)
-    if h_asc > 0:
-        h_max_asc = reglas.get("altura_evacuacion_asc_max_1_salida_m", 10)
-        cumple = h_asc <= h_max_asc
-        verificaciones.append({
-            "regla": f"Altura evacuacion ascendente max. con 1 salida ({h_max_asc} m)",
-            "valor_edificio": f"{h_asc} m",
-            "limite": f"{h_max_asc} m",
-            "resultado": "CUMPLE" if cumple else "NO CUMPLE",
-        })
-
-    # 4. Descending stair protection
+def _regla_escalera_desc(ocupacion, reglas):
+    """4. Descending stair protection."""
+    h_desc = ocupacion["altura_evacuacion_descendente_m"]
     h_no_prot = reglas.get("escalera_desc_no_protegida_max_h_m")
     h_prot = reglas.get("escalera_desc_protegida_max_h_m")
-    if h_no_prot is not None and h_desc > 0:
-        if h_desc <= h_no_prot:
-            tipo_escalera = "No protegida (suficiente)"
-        elif h_prot is not None and h_desc <= h_prot:
-            tipo_escalera = "Protegida (requerida)"
-        else:
-            tipo_escalera = "Especialmente protegida (requerida)"
-        verificaciones.append({
-            "regla": "Tipo de escalera requerida (evacuacion descendente)",
-            "valor_edificio": f"{h_desc} m de altura",
-            "limite": f"No protegida: h<={h_no_prot}m | Protegida: h<={h_prot}m",
-            "resultado": tipo_escalera,
-        })
-
-    # 5. Ascending stair protection
-    if h_asc > 0:
-        h_asc_no_prot = reglas.get("escalera_asc_no_protegida_max_h_m", 2.80)
-        if reglas.get("escalera_asc_no_protegida") == "No se admite":
-            tipo_esc_asc = "Especialmente protegida (requerida)"
-        elif h_asc <= h_asc_no_prot:
-            tipo_esc_asc = "No protegida (suficiente)"
-        elif h_asc <= 6.0:
-            tipo_esc_asc = f"No protegida (max {reglas.get('escalera_asc_no_protegida_max_personas', 100)} pers.) o Protegida"
-        else:
-            tipo_esc_asc = "Protegida o Especialmente protegida (requerida)"
-        verificaciones.append({
-            "regla": "Tipo de escalera requerida (evacuacion ascendente)",
-            "valor_edificio": f"{h_asc} m de altura",
-            "limite": f"No protegida: h<={h_asc_no_prot}m",
-            "resultado": tipo_esc_asc,
-        })
-
-    # 6. Door opening direction
+    if h_no_prot is None or not h_desc > 0:
+        return None
+    if h_desc <= h_no_prot:
+        tipo_escalera = "No protegida (suficiente)"
+    elif h_prot is not None and h_desc <= h_prot:
+        tipo_escalera = "Protegida (requerida)"
+    else:
+        tipo_escalera = "Especialmente protegida (requerida)"
+    return {
+        "regla": "Tipo de escalera requerida (evacuacion descendente)",
+        "valor_edificio": f"{h_desc} m de altura",
+        "limite": f"No protegida: h<={h_no_prot}m | Protegida: h<={h_prot}m",
+        "resultado": tipo_escalera,
+    }
+
+
+def _regla_escalera_asc(ocupacion, reglas):
+    """5. Ascending stair protection."""
+    h_asc = ocupacion["altura_evacuacion_ascendente_m"]
+    if not h_asc > 0:
+        return None
+    h_asc_no_prot = reglas.get("escalera_asc_no_protegida_max_h_m", 2.80)
+    if reglas.get("escalera_asc_no_protegida") == "No se admite":
+        tipo_esc_asc = "Especialmente protegida (requerida)"
+    elif h_asc <= h_asc_no_prot:
+        tipo_esc_asc = "No protegida (suficiente)"
+    elif h_asc <= 6.0:
+        tipo_esc_asc = f"No protegida (max {reglas.get('escalera_asc_no_protegida_max_personas', 100)} pers.) o Protegida"
+    else:
+        tipo_esc_asc = "Protegida o Especialmente protegida (requerida)"
+    return {
+        "regla": "Tipo de escalera requerida (evacuacion ascendente)",
+        "valor_edificio": f"{h_asc} m de altura",
+        "limite": f"No protegida: h<={h_asc_no_prot}m",
+        "resultado": tipo_esc_asc,
+    }
+
+
+def _regla_sentido_puertas(ocupacion, reglas):
+    """6. Door opening direction."""
+    ocup_total = ocupacion["ocupacion_total"]
     limite_puertas = reglas.get("puertas_sentido_evacuacion_personas", 100)
     necesita = ocup_total > limite_puertas
-    verificaciones.append({
+    return {
         "regla": f"Puertas abren en sentido evacuacion (>{limite_puertas} pers.)",
         "valor_edificio": f"{ocup_total} personas",
         "limite": f"{limite_puertas} personas",
         "resultado": "REQUERIDO" if necesita else "No requerido",
-    })
+    }
 
-    # 7. Minimum door width (A >= P/200 >= 0.80 m)
-    anchura_min_puerta = max(ocup_total / 200, 0.80)
-    verificaciones.append({
+
+def _regla_anchura_puertas(ocupacion, reglas):
+    """7. Minimum door width (A >= P/200 >= 0.80 m)."""
+    ocup_total = ocupacion["ocupacion_total"]
+    anchura_min_puerta = float(compute_widths(ocup_total, 0.0)["puerta"])
+    return {
         "regla": "Anchura minima puertas de evacuacion",
         "valor_edificio": f"P={ocup_total} personas",
         "limite": f"A >= P/200 >= 0.80 m",
         "resultado": f"Anchura minima requerida: {anchura_min_puerta:.2f} m",
-    })
+    }
+
 
-    # 8. Minimum corridor width (A >= P/200 >= 1.00 m)
-    anchura_min_pasillo = max(ocup_total / 200, 1.00)
+def _regla_anchura_pasillos(ocupacion, reglas):
+    """8. Minimum corridor width (A >= P/200 >= 1.00 m)."""
+    ocup_total = ocupacion["ocupacion_total"]
+    anchura_min_pasillo = float(compute_widths(ocup_total, 0.0)["pasillo"])
     anchura_min_especifica = reglas.get("anchura_min_pasillos_m")
     if anchura_min_especifica:
         anchura_min_pasillo = max(anchura_min_pasillo, anchura_min_especifica)
-    verificaciones.append({
+    return {
         "regla": "Anchura minima pasillos de evacuacion",
         "valor_edificio": f"P={ocup_total} personas",
         "limite": f"A >= P/200 >= 1.00 m",
         "resultado": f"Anchura minima requerida: {anchura_min_pasillo:.2f} m",
-    })
-
-    # 9. Unprotected descending stair width (A >= P/160)
-    if h_desc > 0:
-        anchura_min_esc = ocup_total / 160
-        verificaciones.append({
-            "regla": "Anchura minima escalera no protegida (descendente)",
-            "valor_edificio": f"P={ocup_total} personas",
-            "limite": "A >= P/160",
-            "resultado": f"Anchura minima requerida: {anchura_min_esc:.2f} m",
-        })
-
-    # 10. Unprotected ascending stair width (A >= P/(160-10h))
-    if h_asc > 0:
-        divisor = 160 - 10 * h_asc
-        if divisor > 0:
-            anchura_min_esc_asc = ocup_total / divisor
-            verificaciones.append({
-                "regla": "Anchura minima escalera no protegida (ascendente)",
-                "valor_edificio": f"P={ocup_total}, h={h_asc}m",
-                "limite": "A >= P/(160-10h)",
-                "resultado": f"Anchura minima requerida: {anchura_min_esc_asc:.2f} m",
-            })
-
-    # 11. Smoke control
+    }
+
+
+def _regla_anchura_escalera_desc(ocupacion, reglas):
+    """9. Unprotected descending stair width (A >= P/160)."""
+    if not ocupacion["altura_evacuacion_descendente_m"] > 0:
+        return None
+    ocup_total = ocupacion["ocupacion_total"]
+    anchura_min_esc = float(compute_widths(ocup_total, 0.0)["esc_desc"])
+    return {
+        "regla": "Anchura minima escalera no protegida (descendente)",
+        "valor_edificio": f"P={ocup_total} personas",
+        "limite": "A >= P/160",
+        "resultado": f"Anchura minima requerida: {anchura_min_esc:.2f} m",
+    }
+
+
+def _regla_anchura_escalera_asc(ocupacion, reglas):
+    """10. Unprotected ascending stair width (A >= P/(160-10h))."""
+    h_asc = ocupacion["altura_evacuacion_ascendente_m"]
+    if not h_asc > 0:
+        return None
+    ocup_total = ocupacion["ocupacion_total"]
+    anchura_min_esc_asc = float(compute_widths(ocup_total, h_asc)["esc_asc"])
+    if anchura_min_esc_asc == np.inf:  # 160 - 10h <= 0
+        return None
+    return {
+        "regla": "Anchura minima escalera no protegida (ascendente)",
+        "valor_edificio": f"P={ocup_total}, h={h_asc}m",
+        "limite": "A >= P/(160-10h)",
+        "resultado": f"Anchura minima requerida: {anchura_min_esc_asc:.2f} m",
+    }
+
+
+def _regla_control_humo(ocupacion, reglas):
+    """11. Smoke control."""
+    ocup_total = ocupacion["ocupacion_total"]
     control_humo_min = reglas.get("control_humo_ocupacion_min")
     control_humo_fijo = reglas.get("control_humo")
     if control_humo_fijo:
-        verificaciones.append({
+        return {
             "regla": "Control de humo de incendio",
             "valor_edificio": f"{ocup_total} personas",
             "limite": control_humo_fijo,
             "resultado": "REQUERIDO",
-        })
-    elif control_humo_min:
+        }
+    if control_humo_min:
         necesita = ocup_total > control_humo_min
-        verificaciones.append({
+        return {
             "regla": f"Control de humo de incendio (>{control_humo_min} pers.)",
             "valor_edificio": f"{ocup_total} personas",
             "limite": f"{control_humo_min} personas",
             "resultado": "REQUERIDO" if necesita else "No requerido",
-        })
+        }
+    return None
 
-    # 12. Disability refuge zones
+
+def _regla_zonas_refugio(ocupacion, reglas):
+    """12. Disability refuge zones."""
+    h_desc = ocupacion["altura_evacuacion_descendente_m"]
     evac_disc_h = reglas.get("evacuacion_discapacidad_altura_min_m")
-    if evac_disc_h and h_desc > evac_disc_h:
-        plazas_silla = math.ceil(ocup_total / 100)
-        plazas_movilidad = math.ceil(ocup_total / 33) if tipologia != "Residencial Vivienda" else 0
-        verificaciones.append({
-            "regla": f"Zonas de refugio (altura evac. > {evac_disc_h} m)",
-            "valor_edificio": f"h={h_desc}m, {ocup_total} personas",
-            "limite": "1 silla/100 pers. + 1 movilidad/33 pers.",
-            "resultado": f"Plazas silla: {plazas_silla}, Plazas movilidad reducida: {plazas_movilidad}",
-        })
+    if not (evac_disc_h and h_desc > evac_disc_h):
+        return None
+    ocup_total = ocupacion["ocupacion_total"]
+    plazas_silla = math.ceil(ocup_total / 100)
+    plazas_movilidad = math.ceil(ocup_total / 33) if reglas.get("tipologia", "") != "Residencial Vivienda" else 0
+    return {
+        "regla": f"Zonas de refugio (altura evac. > {evac_disc_h} m)",
+        "valor_edificio": f"h={h_desc}m, {ocup_total} personas",
+        "limite": "1 silla/100 pers. + 1 movilidad/33 pers.",
+        "resultado": f"Plazas silla: {plazas_silla}, Plazas movilidad reducida: {plazas_movilidad}",
+    }
+
+
+REGLAS_CUMPLIMIENTO = (
+    _regla_ocupacion_1_salida,
+    _regla_altura_desc_1_salida,
+    _regla_altura_asc_1_salida,
+    _regla_escalera_desc,
+    _regla_escalera_asc,
+    _regla_sentido_puertas,
+    _regla_anchura_puertas,
+    _regla_anchura_pasillos,
+    _regla_anchura_escalera_desc,
+    _regla_anchura_escalera_asc,
+    _regla_control_humo,
+    _regla_zonas_refugio,
+)
+
 
+def evaluar_cumplimiento(ocupacion, reglas):
+    """
+    Evaluates if the building complies with evacuation rules
+    based on calculated occupancy and typology rules.
+
+    Args:
+        ocupacion: dict from calcular_ocupacion.
+        reglas: dict from obtener_reglas.
+
+    Returns:
+        list of dicts with each check and its result, in the order of
+        REGLAS_CUMPLIMIENTO (checks that do not apply are left out).
+    """
+    verificaciones = []
+    for regla in REGLAS_CUMPLIMIENTO:
+        verificacion = regla(ocupacion, reglas)
+        if verificacion is not None:
+            verificaciones.append(verificacion)
     return verificaciones
 
 
@@ -645,34 +1067,38 @@ def evaluar_cumplimiento(ocupacion, reglas):
 
 def imprimir_ocupacion(ocupacion):
     """Prints occupancy calculation in a readable format."""
-    print(f"\n{'='*60}")
-    print(f"  OCCUPANCY CALCULATION")
-    print(f"{'='*60}")
-    print(f"  Total area: {ocupacion['superficie_total_m2']} m2")
-    print(f"  Total occupancy: {ocupacion['ocupacion_total']} persons")
-    print(f"  Descending evacuation height: {ocupacion['altura_evacuacion_descendente_m']} m")
-    print(f"  Ascending evacuation height: {ocupacion['altura_evacuacion_ascendente_m']} m")
-
-    print(f"\n  --- Occupancy per floor ---")
+    out = []
+    out.append(f"\n{'='*60}")
+    out.append(f"  OCCUPANCY CALCULATION")
+    out.append(f"{'='*60}")
+    out.append(f"  Total area: {ocupacion['superficie_total_m2']} m2")
+    out.append(f"  Total occupancy: {ocupacion['ocupacion_total']} persons")
+    out.append(f"  Descending evacuation height: {ocupacion['altura_evacuacion_descendente_m']} m")
+    out.append(f"  Ascending evacuation height: {ocupacion['altura_evacuacion_ascendente_m']} m")
+
+    out.append(f"\n  --- Occupancy per floor ---")
     for nombre, datos in ocupacion["ocupacion_por_planta"].items():
-        print(f"    {nombre:<20} elev: {datos['elevacion_m']:>6.2f}m | "
+        out.append(f"    {nombre:<20} elev: {datos['elevacion_m']:>6.2f}m | "
               f"area: {datos['superficie_m2']:>8.2f} m2 | "
               f"occ: {datos['ocupantes']:>3} pers.")
 
-    print(f"\n  --- Detail per space ---")
+    out.append(f"\n  --- Detail per space ---")
     for esp in ocupacion["espacios"]:
         dens_str = f"{esp['densidad_m2_persona']}" if esp['densidad_m2_persona'] else "null"
-        print(f"    {esp['planta']:<12} {esp['espacio']:<18} {esp['categoria']:<25} "
+        out.append(f"    {esp['planta']:<12} {esp['espacio']:<18} {esp['categoria']:<25} "
               f"{esp['area_m2']:>7.2f} m2 / {dens_str:<5} = {esp['ocupantes']:>2} pers.")
 
-    print(f"{'='*60}")
+    out.append(f"{'='*60}")
+
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 def imprimir_cumplimiento(verificaciones):
     """Prints compliance evaluation results."""
-    print(f"\n{'='*60}")
-    print(f"  COMPLIANCE EVALUATION")
-    print(f"{'='*60}")
+    out = []
+    out.append(f"\n{'='*60}")
+    out.append(f"  COMPLIANCE EVALUATION")
+    out.append(f"{'='*60}")
 
     for v in verificaciones:
         res = v["resultado"]
@@ -685,14 +1111,16 @@ def imprimir_cumplimiento(verificaciones):
         else:
             indicador = "[i]"
 
-        print(f"\n  {indicador} {v['regla']}")
-        print(f"      Building: {v['valor_edificio']}")
-        print(f"      Limit:    {v['limite']}")
-        print(f"      >>> {res}")
+        out.append(f"\n  {indicador} {v['regla']}")
+        out.append(f"      Building: {v['valor_edificio']}")
+        out.append(f"      Limit:    {v['limite']}")
+        out.append(f"      >>> {res}")
 
-    print(f"\n{'='*60}")
-    print(f"  Legend: [OK]=Pass  [X]=Fail  [!]=Required  [i]=Info")
-    print(f"{'='*60}")
+    out.append(f"\n{'='*60}")
+    out.append(f"  Legend: [OK]=Pass  [X]=Fail  [!]=Required  [i]=Info")
+    out.append(f"{'='*60}")
+
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 # ==========================================================
@@ -751,7 +1179,7 @@ if __name__ == "__main__":
 
     # STEP 3: Calculate real occupancy
     ocupacion = calcular_ocupacion(
-        RUTA_IFC, resultado["tipologia"], reglas,
+        resultado["_model"], resultado["tipologia"], reglas,
         language=LANGUAGE, regulation_id=REGULATION_ID
     )
     imprimir_ocupacion(ocupacion)
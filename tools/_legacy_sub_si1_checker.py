@@ -315,11 +315,13 @@ def classify_risk_level(room_type: str, area_m2: Optional[float], volume_m3: Opt
 # SCAN IFC (RAW FACTS)
 # ============================================================
 
-def scan_ifc_basic(ifc_path: str, preview_limit: int = 200) -> Dict[str, Any]:
+def scan_ifc_basic(ifc_path: str, preview_limit: int = 200,
+                   ifc_file: Optional[ifcopenshell.file] = None) -> Dict[str, Any]:
+    # ifc_file: model already opened for ifc_path (e.g. from a cache)
     file_name = Path(ifc_path).name
 
     try:
-        ifc = ifcopenshell.open(ifc_path)
+        ifc = ifc_file if ifc_file is not None else ifcopenshell.open(ifc_path)
     except Exception as e:
         return {"file_name": file_name, "error": f"Failed to open IFC: {e}", "spaces": [], "doors": [], "counts": {}, "data_quality": {}}
 
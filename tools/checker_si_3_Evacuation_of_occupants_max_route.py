@@ -19,7 +19,12 @@ import math
 import heapq
 import json
 import os
-from collections import defaultdict, Counter, deque
+import re
+import weakref
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 
 import numpy as np
 import ifcopenshell
@@ -27,6 +32,25 @@ import ifcopenshell.util.element as element_util
 import ifcopenshell.util.placement as placement_util
 import ifcopenshell.geom
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba es opcional: se usa el Dijkstra heapq puro
+    HAS_NUMBA = False
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+    HAS_SCIPY = True
+except ImportError:  # scipy es opcional: grafo de puertas con heapq
+    HAS_SCIPY = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # orjson es opcional: json de la stdlib
+    HAS_ORJSON = False
+
 
 # =========================
 # CONFIG
@@ -54,67 +78,202 @@ SNAP_FALLBACK_RADIUS_CELLS = 25
 STAIR_MAX_XY_DIST_M = 3.5  # (no usado en level bridge actual, se deja por compat)
 STAIR_COST_PER_M_VERTICAL = 1.4
 
+# Precisión de las distancias en el kernel Numba: float32 reduce a la mitad
+# la memoria del mapa de costes (error ~1e-4 m, muy por debajo del redondeo
+# a cm); np.float64 da el mismo resultado que el Dijkstra Python
+GRID_DIST_DTYPE = np.float32
+
+# Reglas de puerta de salida: (propiedad, patrón). El patrón puede ser un
+# re.compile (búsqueda), un str acabado en '*' (prefijo) o un valor exacto
+EXIT_DOOR_RULES = (
+    ("IsExternal", True),
+    ("Function", 1),
+)
+
+# Puertas de circulación (Name o Mark), candidatas a level bridge
+CIRCULATION_DOOR_KEYWORDS = ("corridor", "hall", "lobby", "stair", "pasillo", "distrib",
+                             "circulation")
+
+# Workers para el cálculo por space (threads con Numba, procesos sin él)
+N_WORKERS = os.cpu_count() or 1
+
 
 # =========================
 # Helpers
 # =========================
-def point_in_polygon(x, y, poly):
-    inside = False
-    n = len(poly)
-    if n < 3:
+def _poly_xy(poly):
+    """Polígono [(x, y), ...] -> arrays contiguos px, py (float64)."""
+    px, py = np.ascontiguousarray(poly, dtype=np.float64).reshape(-1, 2).T.copy()
+    return px, py
+
+
+def _pip_np(x, y, px, py):
+    """Punto dentro del polígono (paridad de cruces), vectorizado sobre las aristas."""
+    if px.shape[0] < 3:
         return False
-    x0, y0 = poly[0]
-    for i in range(1, n + 1):
-        x1, y1 = poly[i % n]
-        if ((y0 > y) != (y1 > y)):
-            xinters = (x1 - x0) * (y - y0) / (y1 - y0 + 1e-12) + x0
-            if x < xinters:
-                inside = not inside
-        x0, y0 = x1, y1
-    return inside
-
-
-def snap_point_to_poly_boundary(p, poly):
-    x, y = p
-    if point_in_polygon(x, y, poly):
+    x0, y0 = px, py
+    x1, y1 = np.roll(px, -1), np.roll(py, -1)
+    cross = (y0 > y) != (y1 > y)
+    xinters = (x1 - x0) * (y - y0) / (y1 - y0 + 1e-12) + x0
+    return bool(np.count_nonzero(cross & (x < xinters)) & 1)
+
+
+def snap_point_to_poly_boundary(p, poly, poly_xy=None):
+    """
+    p dentro del polígono -> p; si no, su proyección sobre la arista más
+    cercana. poly_xy = _poly_xy(poly) precalculado (una vez por space).
+    """
+    x, y = float(p[0]), float(p[1])
+    px, py = poly_xy if poly_xy is not None else _poly_xy(poly)
+    if HAS_NUMBA:
+        return _snap_nb(x, y, px, py)
+    if px.shape[0] == 0 or _pip_np(x, y, px, py):
         return (x, y)
 
-    best = None
-    best_d2 = float("inf")
-    n = len(poly)
-    for i in range(n):
-        ax, ay = poly[i]
-        bx, by = poly[(i + 1) % n]
-        vx, vy = bx - ax, by - ay
-        wx, wy = x - ax, y - ay
-        vv = vx * vx + vy * vy + 1e-12
-        t = (wx * vx + wy * vy) / vv
-        t = max(0.0, min(1.0, t))
-        px = ax + t * vx
-        py = ay + t * vy
-        d2 = (px - x) ** 2 + (py - y) ** 2
-        if d2 < best_d2:
-            best_d2 = d2
-            best = (px, py)
-    return best if best else (x, y)
+    # proyección sobre todas las aristas a la vez; argmin = primera mínima
+    vx = np.roll(px, -1) - px
+    vy = np.roll(py, -1) - py
+    t = np.clip(((x - px) * vx + (y - py) * vy) / (vx * vx + vy * vy + 1e-12), 0.0, 1.0)
+    qx = px + t * vx
+    qy = py + t * vy
+    k = int(np.argmin((qx - x) ** 2 + (qy - y) ** 2))
+    return (float(qx[k]), float(qy[k]))
+
+
+# Gemelos Numba de _pip_np / rasterize / snap: misma aritmética
+# (sin fastmath) para que las celdas de borde salgan idénticas.
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _pip_nb(x, y, px, py):
+        n = px.shape[0]
+        if n < 3:
+            return False
+        inside = False
+        x0 = px[0]
+        y0 = py[0]
+        for i in range(1, n + 1):
+            x1 = px[i % n]
+            y1 = py[i % n]
+            if (y0 > y) != (y1 > y):
+                xinters = (x1 - x0) * (y - y0) / (y1 - y0 + 1e-12) + x0
+                if x < xinters:
+                    inside = not inside
+            x0 = x1
+            y0 = y1
+        return inside
+
+    @njit(cache=True, nogil=True)
+    def _rasterize_nb(px, py, minx, miny, res, h, w):
+        grid = np.zeros((h, w), dtype=np.bool_)
+        for iy in range(h):
+            cy = miny + (iy + 0.5) * res
+            for ix in range(w):
+                cx = minx + (ix + 0.5) * res
+                if _pip_nb(cx, cy, px, py):
+                    grid[iy, ix] = True
+        return grid
+
+    @njit(cache=True, nogil=True)
+    def _snap_nb(x, y, px, py):
+        if _pip_nb(x, y, px, py):
+            return (x, y)
+        best_x = x
+        best_y = y
+        best_d2 = np.inf
+        n = px.shape[0]
+        for i in range(n):
+            ax = px[i]
+            ay = py[i]
+            bx = px[(i + 1) % n]
+            by = py[(i + 1) % n]
+            vx = bx - ax
+            vy = by - ay
+            wx = x - ax
+            wy = y - ay
+            vv = vx * vx + vy * vy + 1e-12
+            t = (wx * vx + wy * vy) / vv
+            t = max(0.0, min(1.0, t))
+            qx = ax + t * vx
+            qy = ay + t * vy
+            d2 = (qx - x) ** 2 + (qy - y) ** 2
+            if d2 < best_d2:
+                best_d2 = d2
+                best_x = qx
+                best_y = qy
+        return (best_x, best_y)
+
+    # Calentar el JIT al importar (con cache=True solo compila la 1ª vez)
+    _px_dummy = np.array([0.0, 1.0, 0.0])
+    _py_dummy = np.array([0.0, 0.0, 1.0])
+    _rasterize_nb(_px_dummy, _py_dummy, 0.0, 0.0, 0.5, 2, 2)
+    _snap_nb(2.0, 2.0, _px_dummy, _py_dummy)
+    del _px_dummy, _py_dummy
+
+
+# entity -> {prop: valor} de todas sus psets (la primera pset que tenga la
+# clave gana, como el bucle original de pset_get). Las entradas mueren con
+# la entity; las del RouteModel cacheado viven tanto como él.
+_FLAT_PSETS_CACHE = weakref.WeakKeyDictionary()
+
+
+def flat_psets(entity):
+    """get_psets(entity) aplanado y memoizado por entity (solo lectura)."""
+    props = _FLAT_PSETS_CACHE.get(entity)
+    if props is None:
+        props = {}
+        for pset in element_util.get_psets(entity).values():
+            if isinstance(pset, dict):
+                for k, v in pset.items():
+                    props.setdefault(k, v)
+        _FLAT_PSETS_CACHE[entity] = props
+    return props
 
 
 def pset_get(entity, key):
-    psets = element_util.get_psets(entity)
-    for _, pset in psets.items():
-        if isinstance(pset, dict) and key in pset:
-            return pset[key]
-    return None
+    return flat_psets(entity).get(key)
+
+
+class ExitDoorClassifier:
+    """
+    Clasificador exit / no-exit con las reglas precompiladas.
+    Cada regla se traduce una vez al matcher más barato (regex, prefijo o
+    igualdad) y `classify_batch` lee los psets de cada puerta una sola vez.
+    """
+
+    def __init__(self, rules=EXIT_DOOR_RULES):
+        self.rules = tuple((key, self._compile(pattern)) for key, pattern in rules)
+
+    @staticmethod
+    def _compile(pattern):
+        if isinstance(pattern, re.Pattern):
+            return lambda v: isinstance(v, str) and pattern.search(v) is not None
+        if isinstance(pattern, str) and pattern.endswith("*"):
+            prefix = pattern[:-1]
+            return lambda v: isinstance(v, str) and v.startswith(prefix)
+        if isinstance(pattern, bool):
+            return lambda v: v is pattern
+        # mismo criterio que antes: Function == 1 solo si es un int
+        kind = type(pattern)
+        return lambda v: isinstance(v, kind) and v == pattern
+
+    def is_exit(self, door):
+        # psets aplanadas y cacheadas; primera pset que tenga la clave
+        props = flat_psets(door)
+        for key, match in self.rules:
+            if key in props and match(props[key]):
+                return True
+        return False
+
+    def classify_batch(self, doors):
+        """doors -> np.ndarray[bool] alineado con `doors`."""
+        return np.fromiter((self.is_exit(d) for d in doors), dtype=bool, count=len(doors))
 
 
-def is_exit_door(door):
-    is_ext = pset_get(door, "IsExternal")
-    if is_ext is True:
-        return True
-    fn = pset_get(door, "Function")
-    if isinstance(fn, int) and fn == 1:
-        return True
-    return False
+def is_circulation_door(door):
+    name = (door.Name or "").lower()
+    mark = str(pset_get(door, "Mark") or "").lower()
+    kws = CIRCULATION_DOOR_KEYWORDS
+    return any(k in name for k in kws) or any(k in mark for k in kws)
 
 
 def world_xyz_from_object_placement(obj):
@@ -125,23 +284,103 @@ def world_xyz_from_object_placement(obj):
         return None
 
 
+@dataclass
+class DoorIndex:
+    """
+    Lookups por GlobalId de todas las IfcDoor, calculados una sola vez
+    (nombre, Level, placement, exit, circulación) y compartidos por
+    build_door_cells, add_level_bridge_edges y main.
+    """
+    ids: tuple            # GlobalIds en el orden de model.by_type("IfcDoor")
+    ix: dict              # door_id -> posición en ids
+    by_id: dict           # door_id -> IfcDoor
+    name: dict            # door_id -> Name ("" si no hay)
+    level: dict           # door_id -> str(Level) ("" si no hay)
+    xyz: dict             # door_id -> (x, y, z), solo puertas con placement
+    exit_mask: np.ndarray  # bool, alineado con ids
+    is_exit: frozenset
+    is_circulation: frozenset
+
+
+def build_door_index(doors):
+    # cada acceso a atributo / pset cruza a C++: una pasada por puerta
+    ids = tuple(d.GlobalId for d in doors)
+    name, level, xyz = {}, {}, {}
+    circulation = []
+    for did, d in zip(ids, doors):
+        name[did] = d.Name or ""
+        lvl = pset_get(d, "Level")
+        level[did] = str(lvl) if lvl is not None else ""
+        p = world_xyz_from_object_placement(d)
+        if p is not None:
+            xyz[did] = p
+        if is_circulation_door(d):
+            circulation.append(did)
+    exit_mask = ExitDoorClassifier().classify_batch(doors)
+    return DoorIndex(
+        ids=ids,
+        ix={did: i for i, did in enumerate(ids)},
+        by_id=dict(zip(ids, doors)),
+        name=name,
+        level=level,
+        xyz=xyz,
+        exit_mask=exit_mask,
+        is_exit=frozenset(did for did, is_exit in zip(ids, exit_mask) if is_exit),
+        is_circulation=frozenset(circulation),
+    )
+
+
 # =========================
 # Compliance helpers (CTE DB-SI SI3.3)
 # =========================
 def load_regulation_rules(rules_path):
+    """
+    Lee regulation_rules.json, cacheado por (ruta, mtime_ns, tamaño): si el
+    fichero cambia se vuelve a leer. El dict devuelto es compartido: no
+    modificarlo.
+    """
     if not os.path.exists(rules_path):
         raise FileNotFoundError(f"Rules JSON not found: {rules_path}")
-    with open(rules_path, "r", encoding="utf-8") as f:
+    st = os.stat(rules_path)
+    return _load_regulation_rules_cached(os.path.abspath(rules_path),
+                                         st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=8)
+def _load_regulation_rules_cached(abs_path, mtime_ns, size):
+    if HAS_ORJSON:
+        with open(abs_path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(abs_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+# (id(all_rules), typology) -> (all_rules, límites). Se guarda all_rules
+# para comprobar la identidad: el id solo es válido mientras vive el dict.
+_ROUTE_LIMITS_CACHE = {}
+
+
 def get_applicable_route_limits(all_rules, typology):
     """
     Devuelve límites relevantes (m):
       - single_exit_limit_m: max_route_single_exit_m (general o tipología)
       - multiple_exits_limit_m: max_route_multiple_exits_m (general)
       - dead_end_limit_m: dead_end_max_m (general)
+    Cacheado por (dict de reglas, tipología); el resultado es compartido:
+    no modificarlo.
     """
+    key = (id(all_rules), typology)
+    hit = _ROUTE_LIMITS_CACHE.get(key)
+    if hit is not None and hit[0] is all_rules:
+        return hit[1]
+    limits = _route_limits(all_rules, typology)
+    if len(_ROUTE_LIMITS_CACHE) >= 32:
+        _ROUTE_LIMITS_CACHE.clear()
+    _ROUTE_LIMITS_CACHE[key] = (all_rules, limits)
+    return limits
+
+
+def _route_limits(all_rules, typology):
     general = dict(all_rules.get("general", {}))
     by_typ = all_rules.get("by_typology", {}).get(typology, {}) if typology else {}
 
@@ -249,47 +488,74 @@ def compliance_check_evacuation(per_space_data, spaces_by_id, n_exit_doors,
 # =========================
 # Geometry
 # =========================
-def get_shape_mesh(ifc_entity):
+@lru_cache(maxsize=None)
+def _geom_settings():
+    """Settings de geometría compartidos (coordenadas de mundo)."""
     settings = ifcopenshell.geom.settings()
     settings.set(settings.USE_WORLD_COORDS, True)
-    shape = ifcopenshell.geom.create_shape(settings, ifc_entity)
-    geom = shape.geometry
+    return settings
+
+
+def _mesh_arrays(geom):
     verts = np.array(geom.verts, dtype=float).reshape(-1, 3)
     faces = np.array(geom.faces, dtype=int).reshape(-1, 3)
     return verts, faces
 
 
-def tri_normal(v0, v1, v2):
-    n = np.cross(v1 - v0, v2 - v0)
-    norm = np.linalg.norm(n)
-    if norm < 1e-12:
-        return np.array([0.0, 0.0, 0.0])
-    return n / norm
+def get_shape_mesh(ifc_entity):
+    shape = ifcopenshell.geom.create_shape(_geom_settings(), ifc_entity)
+    return _mesh_arrays(shape.geometry)
+
+
+def get_space_meshes(model, spaces):
+    """
+    {GlobalId: (verts, faces)} de los spaces con el iterador multihilo de
+    ifcopenshell. Si el iterador falla se devuelve lo obtenido hasta ese
+    momento: los spaces que falten se mallan uno a uno con get_shape_mesh.
+    """
+    meshes = {}
+    if not spaces:
+        return meshes
+    try:
+        it = ifcopenshell.geom.iterator(_geom_settings(), model, N_WORKERS, include=spaces)
+        if it.initialize():
+            while True:
+                shape = it.get()
+                meshes[shape.guid] = _mesh_arrays(shape.geometry)
+                if not it.next():
+                    break
+    except Exception as e:
+        print(f"[WARN] Geometry iterator failed, meshing spaces one by one: {e}")
+    return meshes
 
 
 def footprint_from_space_mesh(verts, faces, z_tol=FLOOR_TRI_Z_TOL, horiz_tol=HORIZONTAL_NORMAL_TOL):
     zmin = float(np.min(verts[:, 2]))
-    floor_tris = []
-    for f in faces:
-        v0, v1, v2 = verts[f[0]], verts[f[1]], verts[f[2]]
-        n = tri_normal(v0, v1, v2)
-        if abs(abs(n[2]) - 1.0) > horiz_tol:
-            continue
-        zavg = float((v0[2] + v1[2] + v2[2]) / 3.0)
-        if abs(zavg - zmin) > z_tol:
-            continue
-        floor_tris.append((f[0], f[1], f[2]))
 
-    if not floor_tris:
+    # normales y z medias de todos los triángulos a la vez (normal nula si
+    # el triángulo es degenerado)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    v = verts[faces]                                   # (F, 3, 3)
+    n = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    norm = np.linalg.norm(n, axis=1)
+    nz = np.zeros(len(faces))
+    ok = norm >= 1e-12
+    nz[ok] = n[ok, 2] / norm[ok]
+    zavg = (v[:, 0, 2] + v[:, 1, 2] + v[:, 2, 2]) / 3.0
+    keep = (np.abs(np.abs(nz) - 1.0) <= horiz_tol) & (np.abs(zavg - zmin) <= z_tol)
+    floor_tris = faces[keep]
+
+    if len(floor_tris) == 0:
         return None
 
-    edge_count = Counter()
-    for a, b, c in floor_tris:
-        for u, v in ((a, b), (b, c), (c, a)):
-            key = (u, v) if u < v else (v, u)
-            edge_count[key] += 1
-
-    boundary_edges = [e for e, cnt in edge_count.items() if cnt == 1]
+    # aristas de borde = aristas (no orientadas) que aparecen una sola vez;
+    # en orden de primera aparición (a-b, b-c, c-a por triángulo) para que
+    # el inicio y el sentido del recorrido no cambien
+    edges = floor_tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    edges.sort(axis=1)
+    keys = edges[:, 0] * (int(edges.max()) + 1) + edges[:, 1]
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    boundary_edges = edges[np.sort(first[counts == 1])].tolist()
     if len(boundary_edges) < 3:
         return None
 
@@ -335,14 +601,27 @@ def rasterize_polygon(poly, res=GRID_RES):
 
     w = int(math.ceil((maxx - minx) / res))
     h = int(math.ceil((maxy - miny) / res))
-    grid = np.zeros((h, w), dtype=bool)
 
-    for iy in range(h):
-        cy = miny + (iy + 0.5) * res
-        for ix in range(w):
-            cx = minx + (ix + 0.5) * res
-            if point_in_polygon(cx, cy, poly):
-                grid[iy, ix] = True
+    if HAS_NUMBA:
+        px, py = _poly_xy(poly)
+        return _rasterize_nb(px, py, minx, miny, float(res), h, w), (minx, miny), res
+
+    # Sin Numba: ray casting vectorizado, una pasada NumPy por arista.
+    # cond y xinters solo dependen de la fila (cy), se comparan con todas
+    # las columnas (cx) por broadcasting y se acumula la paridad con XOR.
+    grid = np.zeros((h, w), dtype=bool)
+    if len(poly) < 3:
+        return grid, (minx, miny), res
+    cx = minx + (np.arange(w) + 0.5) * res
+    cy = miny + (np.arange(h) + 0.5) * res
+    x0, y0 = _poly_xy(poly)
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    for i in range(len(x0)):
+        cond = (y0[i] > cy) != (y1[i] > cy)
+        if not cond.any():
+            continue
+        xinters = (x1[i] - x0[i]) * (cy[cond] - y0[i]) / (y1[i] - y0[i] + 1e-12) + x0[i]
+        grid[cond] ^= cx[None, :] < xinters[:, None]
 
     return grid, (minx, miny), res
 
@@ -367,35 +646,68 @@ def neighbors(iy, ix, grid, diagonals=True):
             yield ny, nx, cost
 
 
-def snap_cell_to_walkable(grid, cell, max_radius_cells):
-    h, w = grid.shape
-    iy, ix = cell
-    if 0 <= iy < h and 0 <= ix < w and grid[iy, ix]:
-        return (iy, ix)
-
-    q = deque()
-    seen = set()
-    q.append((iy, ix, 0))
-    seen.add((iy, ix))
-
+@lru_cache(maxsize=None)
+def _bfs_ring_offsets(max_radius_cells):
+    """
+    Offsets (dy, dx) en el orden exacto en que la BFS 4-conexa los visita,
+    hasta distancia Manhattan max_radius_cells. No dependen de la grid
+    (la BFS expande igual por celdas transitables y no transitables), así
+    que se calculan una vez por radio. Devuelve dos arrays int64.
+    """
+    order = []
+    q = deque([(0, 0, 0)])
+    seen = {(0, 0)}
     while q:
         y, x, d = q.popleft()
         if d > max_radius_cells:
             continue
-        if 0 <= y < h and 0 <= x < w and grid[y, x]:
-            return (y, x)
+        order.append((y, x))
         for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
             ny, nx = y + dy, x + dx
             if (ny, nx) not in seen:
                 seen.add((ny, nx))
                 q.append((ny, nx, d + 1))
-    return None
+    off = np.array(order, dtype=np.int64)
+    return off[:, 0], off[:, 1]
+
+
+def snap_cell_to_walkable(grid, cell, max_radius_cells):
+    """
+    Celda transitable más cercana (BFS 4-conexa, distancia Manhattan
+    <= max_radius_cells) o None. Evalúa todos los candidatos de golpe en
+    orden BFS y se queda con el primero transitable.
+    """
+    h, w = grid.shape
+    iy, ix = cell
+    if 0 <= iy < h and 0 <= ix < w and grid[iy, ix]:
+        return (iy, ix)
+
+    dy, dx = _bfs_ring_offsets(int(max_radius_cells))
+    ys = dy + iy
+    xs = dx + ix
+    inside = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+    ok = np.zeros(ys.shape, dtype=bool)
+    ok[inside] = grid[ys[inside], xs[inside]]
+    k = int(ok.argmax())
+    if not ok[k]:
+        return None
+    return (int(ys[k]), int(xs[k]))
 
 
 def dijkstra_grid_from_source(grid, res, source_cell, diagonals=True):
     h, w = grid.shape
-    dist = np.full((h, w), float("inf"), dtype=float)
     sy, sx = source_cell
+    if HAS_NUMBA:
+        # kernel multi-source con una sola seed de coste 0; dist en float64
+        # (no GRID_DIST_DTYPE): son los pesos del grafo de puertas
+        return _grid_dijkstra_nb(
+            np.ascontiguousarray(grid, dtype=np.bool_), float(res),
+            np.array([sy], dtype=np.int64), np.array([sx], dtype=np.int64),
+            np.zeros(1, dtype=np.float64), bool(diagonals),
+            np.full(h * w, np.inf, dtype=np.float64)
+        )
+
+    dist = np.full((h, w), float("inf"), dtype=float)
     if not (0 <= sy < h and 0 <= sx < w and grid[sy, sx]):
         return dist
 
@@ -413,7 +725,29 @@ def dijkstra_grid_from_source(grid, res, source_cell, diagonals=True):
     return dist
 
 
-def grid_multisource_dijkstra(grid, res, seeds, diagonals=True):
+def grid_multisource_dijkstra_arrays(grid, res, seed_ys, seed_xs, seed_costs, diagonals=True,
+                                     ctx=None):
+    """
+    Dijkstra multi-source sobre la grid; seeds como tres arrays paralelos
+    (iy, ix, coste inicial). Orden de preferencia: kernel Numba > scipy csgraph > heapq puro.
+    ctx: grid_dijkstra_ctx(...) precalculado, solo lo usa la vía scipy.
+    """
+    if HAS_NUMBA and len(seed_ys):
+        return _grid_dijkstra_nb(
+            np.ascontiguousarray(grid, dtype=np.bool_), float(res),
+            np.asarray(seed_ys, dtype=np.int64), np.asarray(seed_xs, dtype=np.int64),
+            np.asarray(seed_costs, dtype=np.float64), bool(diagonals),
+            np.full(grid.size, np.inf, dtype=GRID_DIST_DTYPE)
+        )
+    if HAS_SCIPY and len(seed_ys):
+        return _grid_multisource_dijkstra_scipy(grid, res, seed_ys, seed_xs, seed_costs, diagonals,
+                                                ctx)
+    seeds = list(zip(np.asarray(seed_ys).tolist(), np.asarray(seed_xs).tolist(),
+                     np.asarray(seed_costs, dtype=float).tolist()))
+    return _grid_multisource_dijkstra_py(grid, res, seeds, diagonals)
+
+
+def _grid_multisource_dijkstra_py(grid, res, seeds, diagonals=True):
     h, w = grid.shape
     dist = np.full((h, w), float("inf"), dtype=float)
     pq = []
@@ -436,6 +770,322 @@ def grid_multisource_dijkstra(grid, res, seeds, diagonals=True):
     return dist
 
 
+# =========================
+# Scipy csgraph (opcional)
+# =========================
+def _grid_csr_edges(grid, res, diagonals=True):
+    """
+    Aristas de la grid entre celdas transitables, con ids lineales.
+    Devuelve (rows, cols, data, ids, n): ids (h, w) = id del nodo o -1 si la
+    celda no es transitable; n = número de celdas transitables. Pesos como
+    en neighbors(): res o sqrt(2)*res.
+    """
+    h, w = grid.shape
+    flat = np.ascontiguousarray(grid, dtype=bool).ravel()
+    ids = np.cumsum(flat, dtype=np.int64) - 1
+    ids[~flat] = -1
+    ids = ids.reshape(h, w)
+    n = int(flat.sum())
+
+    steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if diagonals:
+        steps += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    rows, cols, data = [], [], []
+    for dy, dx in steps:
+        # celda (y, x) -> vecina (y+dy, x+dx), ambas dentro de la grid
+        src = ids[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)]
+        dst = ids[max(0, dy):h - max(0, -dy), max(0, dx):w - max(0, -dx)]
+        ok = (src >= 0) & (dst >= 0)
+        step = math.sqrt(2) if (dy != 0 and dx != 0) else 1.0
+        rows.append(src[ok])
+        cols.append(dst[ok])
+        data.append(np.full(int(ok.sum()), step * res, dtype=np.float64))
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(data), ids, n
+
+
+def _grid_cell_distances_scipy(grid, res, cells, diagonals=True):
+    """
+    Distancias de grid entre todos los pares de cells con un único
+    csgraph.dijkstra (C), una fila por source. Devuelve matriz (k, k);
+    inf si alguna de las dos celdas no es transitable o cae fuera.
+    """
+    h, w = grid.shape
+    rows, cols, data, ids, n = _grid_csr_edges(grid, res, diagonals)
+    node = np.array([ids[cy, cx] if (0 <= cy < h and 0 <= cx < w) else -1
+                     for cy, cx in cells], dtype=np.int64)
+    out = np.full((len(cells), len(cells)), np.inf)
+    valid = np.flatnonzero(node >= 0)
+    if valid.size == 0:
+        return out
+    graph = csr_matrix((data, (rows, cols)), shape=(n, n))
+    dist = csgraph_dijkstra(graph, directed=True, indices=node[valid])
+    out[np.ix_(valid, valid)] = dist[:, node[valid]]
+    return out
+
+
+def grid_dijkstra_ctx(grid, res, diagonals=True):
+    """
+    Contexto reutilizable para _grid_multisource_dijkstra_scipy:
+    (csr, ids, walkable). csr tiene n+1 nodos; la fila n (super-source)
+    va vacía y se rellena con las seeds en cada llamada.
+    """
+    rows, cols, data, ids, n = _grid_csr_edges(grid, res, diagonals)
+    csr = csr_matrix((data, (rows, cols)), shape=(n + 1, n + 1))
+    return csr, ids, (ids >= 0).ravel()
+
+
+def _grid_multisource_dijkstra_scipy(grid, res, seed_ys, seed_xs, seed_costs, diagonals=True,
+                                     ctx=None):
+    """
+    Multi-source con coste inicial por seed: super-source (nodo n) unido a
+    cada seed con peso = su coste; con seeds repetidas se queda la mínima.
+    ctx = grid_dijkstra_ctx(grid, res, diagonals) evita rehacer la CSR.
+    """
+    h, w = grid.shape
+    csr, ids, walkable = ctx if ctx is not None else grid_dijkstra_ctx(grid, res, diagonals)
+    n = csr.shape[0] - 1
+    ys = np.asarray(seed_ys, dtype=np.int64)
+    xs = np.asarray(seed_xs, dtype=np.int64)
+    cs = np.asarray(seed_costs, dtype=np.float64)
+    inside = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+    ys, xs, cs = ys[inside], xs[inside], cs[inside]
+    seed_ids = ids[ys, xs]
+    ok = seed_ids >= 0
+    seed_ids, cs = seed_ids[ok], cs[ok]
+
+    dist = np.full(h * w, np.inf)
+    if seed_ids.size == 0:
+        return dist.reshape(h, w)
+
+    # una arista por celda seed, con el coste mínimo
+    base = np.full(n, np.inf)
+    np.minimum.at(base, seed_ids, cs)
+    seeded = np.flatnonzero(np.isfinite(base))
+
+    # la fila n es la última: basta con añadir sus aristas al final
+    indptr = csr.indptr.copy()
+    indptr[-1] += seeded.size
+    graph = csr_matrix(
+        (np.concatenate([csr.data, base[seeded]]),
+         np.concatenate([csr.indices, seeded.astype(csr.indices.dtype)]),
+         indptr),
+        shape=csr.shape)
+    d = csgraph_dijkstra(graph, directed=True, indices=n)
+    dist[walkable] = d[:n]
+    return dist.reshape(h, w)
+
+
+# =========================
+# Numba kernel (opcional)
+# =========================
+# Heap binario indexado sobre celdas planas (idx = iy*w + ix) con
+# decrease-key: pos[idx] = posición en el heap, -1 = no visto, -2 = cerrado.
+# Así el heap nunca pasa de h*w entradas (sin duplicados "lazy").
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _heap_sift_up(heap, pos, dist, i):
+        item = heap[i]
+        key = dist[item]
+        while i > 0:
+            parent = (i - 1) >> 1
+            p_item = heap[parent]
+            if dist[p_item] <= key:
+                break
+            heap[i] = p_item
+            pos[p_item] = i
+            i = parent
+        heap[i] = item
+        pos[item] = i
+
+    @njit(cache=True, nogil=True)
+    def _heap_sift_down(heap, pos, dist, i, size):
+        item = heap[i]
+        key = dist[item]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and dist[heap[child + 1]] < dist[heap[child]]:
+                child += 1
+            c_item = heap[child]
+            if dist[c_item] >= key:
+                break
+            heap[i] = c_item
+            pos[c_item] = i
+            i = child
+        heap[i] = item
+        pos[item] = i
+
+    @njit(cache=True, nogil=True)
+    def _grid_dijkstra_nb(grid, res, seed_ys, seed_xs, seed_costs, diagonals, dist):
+        # dist: array plano (h*w) ya inicializado a inf; su dtype decide la
+        # precisión con la que se guardan las distancias
+        h, w = grid.shape
+        n = h * w
+        heap = np.empty(n, dtype=np.int64)
+        pos = np.full(n, -1, dtype=np.int64)
+        size = 0
+
+        # 4 ortogonales primero, luego 4 diagonales
+        dys = np.array([-1, 1, 0, 0, -1, -1, 1, 1])
+        dxs = np.array([0, 0, -1, 1, -1, 1, -1, 1])
+        n_steps = 8 if diagonals else 4
+        diag = math.sqrt(2)
+
+        for k in range(seed_ys.shape[0]):
+            iy = seed_ys[k]
+            ix = seed_xs[k]
+            if 0 <= iy < h and 0 <= ix < w and grid[iy, ix]:
+                idx = iy * w + ix
+                c0 = seed_costs[k]
+                if c0 < dist[idx]:
+                    dist[idx] = c0
+                    if pos[idx] == -1:
+                        heap[size] = idx
+                        pos[idx] = size
+                        size += 1
+                    _heap_sift_up(heap, pos, dist, pos[idx])
+
+        while size > 0:
+            u = heap[0]
+            pos[u] = -2
+            size -= 1
+            if size > 0:
+                heap[0] = heap[size]
+                pos[heap[0]] = 0
+                _heap_sift_down(heap, pos, dist, 0, size)
+
+            d = dist[u]
+            y = u // w
+            x = u - y * w
+            for k in range(n_steps):
+                ny = y + dys[k]
+                nx = x + dxs[k]
+                if 0 <= ny < h and 0 <= nx < w and grid[ny, nx]:
+                    v = ny * w + nx
+                    if pos[v] == -2:
+                        continue
+                    step = diag if k >= 4 else 1.0
+                    nd = d + step * res
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        if pos[v] == -1:
+                            heap[size] = v
+                            pos[v] = size
+                            size += 1
+                        _heap_sift_up(heap, pos, dist, pos[v])
+
+        return dist.reshape(h, w)
+
+    @njit(cache=True, nogil=True)
+    def _door_pair_dists_nb(grid, res, cell_ys, cell_xs, diagonals):
+        # Dijkstra desde cada puerta i que se corta en cuanto están cerradas
+        # las celdas de todas las puertas j > i: solo se necesita la mitad
+        # superior y la distancia de una celda cerrada ya es definitiva.
+        # Los arrays del heap se reservan una vez para todas las sources.
+        h, w = grid.shape
+        n = h * w
+        k = cell_ys.shape[0]
+        out = np.full((k, k), np.inf)
+        dist = np.empty(n, dtype=np.float64)
+        heap = np.empty(n, dtype=np.int64)
+        pos = np.empty(n, dtype=np.int64)
+        need = np.zeros(n, dtype=np.bool_)
+
+        dys = np.array([-1, 1, 0, 0, -1, -1, 1, 1])
+        dxs = np.array([0, 0, -1, 1, -1, 1, -1, 1])
+        n_steps = 8 if diagonals else 4
+        diag = math.sqrt(2)
+
+        cells = np.full(k, -1, dtype=np.int64)
+        for i in range(k):
+            iy = cell_ys[i]
+            ix = cell_xs[i]
+            if 0 <= iy < h and 0 <= ix < w and grid[iy, ix]:
+                cells[i] = iy * w + ix
+
+        for i in range(k - 1):
+            src = cells[i]
+            if src < 0:
+                continue
+            remaining = 0
+            for j in range(i + 1, k):
+                c = cells[j]
+                if c >= 0 and not need[c]:
+                    need[c] = True
+                    remaining += 1
+
+            dist[:] = np.inf
+            pos[:] = -1
+            dist[src] = 0.0
+            heap[0] = src
+            pos[src] = 0
+            size = 1
+
+            while size > 0 and remaining > 0:
+                u = heap[0]
+                pos[u] = -2
+                size -= 1
+                if size > 0:
+                    heap[0] = heap[size]
+                    pos[heap[0]] = 0
+                    _heap_sift_down(heap, pos, dist, 0, size)
+                if need[u]:
+                    need[u] = False
+                    remaining -= 1
+
+                d = dist[u]
+                y = u // w
+                x = u - y * w
+                for s in range(n_steps):
+                    ny = y + dys[s]
+                    nx = x + dxs[s]
+                    if 0 <= ny < h and 0 <= nx < w and grid[ny, nx]:
+                        v = ny * w + nx
+                        if pos[v] == -2:
+                            continue
+                        step = diag if s >= 4 else 1.0
+                        nd = d + step * res
+                        if nd < dist[v]:
+                            dist[v] = nd
+                            if pos[v] == -1:
+                                heap[size] = v
+                                pos[v] = size
+                                size += 1
+                            _heap_sift_up(heap, pos, dist, pos[v])
+
+            for j in range(i + 1, k):
+                c = cells[j]
+                if c >= 0:
+                    need[c] = False
+                    if pos[c] == -2:
+                        out[i, j] = dist[c]
+        return out
+
+
+def door_pair_distances(grid, res, cells, diagonals=True):
+    """
+    Distancias de grid entre las celdas de puerta de un space: matriz
+    (k, k) con la mitad superior (i < j) rellena; inf si no hay camino.
+    Orden de preferencia: Numba (Dijkstra cortado por puerta) > scipy
+    (un único csgraph.dijkstra) > heapq por puerta.
+    """
+    k = len(cells)
+    if HAS_NUMBA:
+        return _door_pair_dists_nb(
+            np.ascontiguousarray(grid, dtype=np.bool_), float(res),
+            np.array([c[0] for c in cells], dtype=np.int64),
+            np.array([c[1] for c in cells], dtype=np.int64), bool(diagonals))
+    if HAS_SCIPY:
+        return _grid_cell_distances_scipy(grid, res, cells, diagonals=diagonals)
+    out = np.full((k, k), np.inf)
+    for i in range(k - 1):
+        distmap = dijkstra_grid_from_source(grid, res, cells[i], diagonals=diagonals)
+        for j in range(i + 1, k):
+            out[i, j] = distmap[cells[j]]
+    return out
+
+
 # =========================
 # Conectividad space->doors (robusta)
 # =========================
@@ -443,7 +1093,9 @@ def build_space_door_maps_enhanced(model):
     door_to_spaces = defaultdict(set)
     space_to_doors = defaultdict(set)
 
-    # direct door boundaries
+    # una sola pasada por los IfcRelSpaceBoundary: door boundaries directos
+    # y wall -> spaces (una puerta nunca es muro: basta un elif)
+    wall_to_spaces = defaultdict(set)
     for rel in model.by_type("IfcRelSpaceBoundary"):
         sp = rel.RelatingSpace
         el = rel.RelatedBuildingElement
@@ -452,26 +1104,11 @@ def build_space_door_maps_enhanced(model):
         if el.is_a("IfcDoor"):
             door_to_spaces[el.GlobalId].add(sp.GlobalId)
             space_to_doors[sp.GlobalId].add(el.GlobalId)
-
-    # wall -> spaces
-    wall_to_spaces = defaultdict(set)
-    for rel in model.by_type("IfcRelSpaceBoundary"):
-        sp = rel.RelatingSpace
-        el = rel.RelatedBuildingElement
-        if not sp or not el:
-            continue
-        if el.is_a("IfcWall") or el.is_a("IfcWallStandardCase"):
+        elif el.is_a("IfcWall") or el.is_a("IfcWallStandardCase"):
             wall_to_spaces[el.GlobalId].add(sp.GlobalId)
 
-    # opening -> wall
-    opening_to_wall = {}
-    for rv in model.by_type("IfcRelVoidsElement"):
-        opening = rv.RelatedOpeningElement
-        wall = rv.RelatingBuildingElement
-        if opening and wall:
-            opening_to_wall[opening.GlobalId] = wall.GlobalId
-
-    # door -> opening -> wall -> spaces
+    # door -> opening -> wall -> spaces; el muro de cada opening sale de su
+    # inversa VoidsElements (sin recorrer todos los IfcRelVoidsElement)
     for rf in model.by_type("IfcRelFillsElement"):
         door = rf.RelatedBuildingElement
         opening = rf.RelatingOpeningElement
@@ -479,7 +1116,10 @@ def build_space_door_maps_enhanced(model):
             continue
         if not door.is_a("IfcDoor"):
             continue
-        wall_id = opening_to_wall.get(opening.GlobalId)
+        wall_id = None
+        for rv in opening.VoidsElements:
+            if rv.RelatingBuildingElement:
+                wall_id = rv.RelatingBuildingElement.GlobalId
         if not wall_id:
             continue
         for sid in wall_to_spaces.get(wall_id, set()):
@@ -489,21 +1129,12 @@ def build_space_door_maps_enhanced(model):
     return door_to_spaces, space_to_doors
 
 
-def build_door_cells(model, space_polys, space_grids, space_to_doors):
-    doors = model.by_type("IfcDoor")
-    door_by_id = {d.GlobalId: d for d in doors}
+def build_door_cells(door_index, space_polys, space_grids, space_to_doors):
+    door_by_id = door_index.by_id
+    door_xyz = door_index.xyz
 
     portal_cells = {}      # (space_id, door_id) -> cell
     door_any_cell = {}     # door_id -> (space_id, cell)
-    door_xyz = {}          # door_id -> (x,y,z)
-    door_level = {}        # door_id -> str(level)
-
-    for d in doors:
-        p = world_xyz_from_object_placement(d)
-        if p is not None:
-            door_xyz[d.GlobalId] = p
-        lvl = pset_get(d, "Level")
-        door_level[d.GlobalId] = str(lvl) if lvl is not None else ""
 
     for sid, door_ids in space_to_doors.items():
         poly = space_polys.get(sid)
@@ -511,6 +1142,7 @@ def build_door_cells(model, space_polys, space_grids, space_to_doors):
         if poly is None or grid_info is None:
             continue
         grid, origin, res = grid_info
+        poly_xy = _poly_xy(poly)
 
         for did in door_ids:
             d = door_by_id.get(did)
@@ -519,7 +1151,7 @@ def build_door_cells(model, space_polys, space_grids, space_to_doors):
             p3 = door_xyz.get(did)
             if p3 is None:
                 continue
-            p2 = snap_point_to_poly_boundary((p3[0], p3[1]), poly)
+            p2 = snap_point_to_poly_boundary((p3[0], p3[1]), poly, poly_xy)
             cell = world_to_cell(p2, origin, res)
 
             cell2 = snap_cell_to_walkable(grid, cell, SNAP_MAX_RADIUS_CELLS)
@@ -532,7 +1164,7 @@ def build_door_cells(model, space_polys, space_grids, space_to_doors):
             if did not in door_any_cell:
                 door_any_cell[did] = (sid, cell2)
 
-    return portal_cells, door_any_cell, door_xyz, door_level
+    return portal_cells, door_any_cell
 
 
 # =========================
@@ -551,14 +1183,13 @@ def build_door_graph(space_grids, portal_cells, space_to_doors):
         if len(ds) < 2:
             continue
 
-        door_cells = {did: portal_cells[(sid, did)] for did in ds}
+        pair_dist = door_pair_distances(grid, res, [portal_cells[(sid, did)] for did in ds],
+                                        diagonals=ALLOW_DIAGONALS)
 
         for i, dsrc in enumerate(ds):
-            distmap = dijkstra_grid_from_source(grid, res, door_cells[dsrc], diagonals=ALLOW_DIAGONALS)
             for j in range(i + 1, len(ds)):
                 dtgt = ds[j]
-                cy, cx = door_cells[dtgt]
-                w = float(distmap[cy, cx])
+                w = float(pair_dist[i, j])
                 if math.isfinite(w):
                     graph[dsrc].append((dtgt, w))
                     graph[dtgt].append((dsrc, w))
@@ -566,7 +1197,7 @@ def build_door_graph(space_grids, portal_cells, space_to_doors):
     return graph
 
 
-def add_level_bridge_edges(model, door_graph, doors, door_xyz, door_level,
+def add_level_bridge_edges(model, door_graph, door_index,
                            cost_per_meter_vertical=1.4,
                            horizontal_penalty=0.2):
     """
@@ -581,26 +1212,18 @@ def add_level_bridge_edges(model, door_graph, doors, door_xyz, door_level,
     for st in model.by_type("IfcBuildingStorey"):
         storey_elev[st.Name or ""] = float(st.Elevation or 0.0)
 
+    door_xyz = door_index.xyz
+
     # Clasificar puertas por nivel
     level_to_doors = defaultdict(list)
-    for d in doors:
-        did = d.GlobalId
-        lvl = door_level.get(did, "")
-        level_to_doors[lvl].append(did)
+    for did in door_index.ids:
+        level_to_doors[door_index.level[did]].append(did)
 
     levels = sorted(level_to_doors.keys())
     if len(levels) < 2:
         print("[WARN] Only one Level detected -> no level bridges added")
         return 0
 
-    def is_circulation_door(door_obj):
-        name = (door_obj.Name or "").lower()
-        mark = str(pset_get(door_obj, "Mark") or "").lower()
-        kws = ["corridor", "hall", "lobby", "stair", "pasillo", "distrib", "circulation"]
-        return any(k in name for k in kws) or any(k in mark for k in kws)
-
-    door_by_id = {d.GlobalId: d for d in doors}
-
     # elegir base/upper por elevaciones si están disponibles
     lvl_elev = {lvl_name: storey_elev[lvl_name] for lvl_name in levels if lvl_name in storey_elev}
 
@@ -619,130 +1242,305 @@ def add_level_bridge_edges(model, door_graph, doors, door_xyz, door_level,
         print("[WARN] Missing doors for base/upper levels -> no level bridges added")
         return 0
 
-    base_cands = [did for did in base_doors if is_circulation_door(door_by_id[did])]
+    base_cands = [did for did in base_doors if did in door_index.is_circulation]
     if not base_cands:
         base_cands = base_doors
 
     K = min(4, len(base_cands))
 
-    added = 0
-    for u in upper_doors:
-        pu = door_xyz.get(u)
-        if pu is None:
-            continue
+    # pesos upper x base de una vez; solo puertas con placement
+    ups = [u for u in upper_doors if u in door_xyz]
+    bases = [v for v in base_cands if v in door_xyz]
+    if not ups or not bases:
+        return 0
+    pu = np.array([door_xyz[u] for u in ups], dtype=float)
+    pv = np.array([door_xyz[v] for v in bases], dtype=float)
+    dxy = np.hypot(pu[:, None, 0] - pv[None, :, 0], pu[:, None, 1] - pv[None, :, 1])
+    dz = np.abs(pu[:, None, 2] - pv[None, :, 2])
+    w = dz * cost_per_meter_vertical + horizontal_penalty * dxy
 
-        dists = []
-        for v in base_cands:
-            pv = door_xyz.get(v)
-            if pv is None:
-                continue
-            dxy = math.hypot(pu[0] - pv[0], pu[1] - pv[1])
-            dz = abs(pu[2] - pv[2])
-            w = dz * cost_per_meter_vertical + horizontal_penalty * dxy
-            dists.append((w, v))
-        dists.sort(key=lambda t: t[0])
-
-        for w, v in dists[:K]:
-            door_graph[u].append((v, w))
-            door_graph[v].append((u, w))
+    # K más baratas por fila; stable = mismo desempate que list.sort
+    nearest = np.argsort(w, axis=1, kind="stable")[:, :K]
+
+    added = 0
+    for i, u in enumerate(ups):
+        for j in nearest[i].tolist():
+            v = bases[j]
+            wij = float(w[i, j])
+            door_graph[u].append((v, wij))
+            door_graph[v].append((u, wij))
             added += 1
 
     return added
 
 
 def dijkstra_doors_to_exit(graph, exit_door_ids):
-    dist = {}
+    """
+    Distancia mínima door -> exit sobre el grafo de puertas.
+    Internamente usa índices enteros densos (listas planas) en vez de dicts
+    por GlobalId; solo se vuelve a GlobalId al devolver el resultado.
+    Returns dict door_id -> dist (solo puertas alcanzables).
+    """
+    # door_id -> índice denso (exits primero, luego nodos y vecinos del grafo)
+    id2ix = {}
+    for did in exit_door_ids:
+        id2ix.setdefault(did, len(id2ix))
+    for u, edges in graph.items():
+        id2ix.setdefault(u, len(id2ix))
+        for v, _ in edges:
+            id2ix.setdefault(v, len(id2ix))
+    ids = list(id2ix)
+    n = len(ids)
+
+    adj = [[] for _ in range(n)]
+    for u, edges in graph.items():
+        adj[id2ix[u]] = [(id2ix[v], w) for v, w in edges]
+
+    if HAS_SCIPY and exit_door_ids:
+        dist_arr = _door_dijkstra_scipy(adj, n, [id2ix[did] for did in exit_door_ids])
+        return {ids[i]: float(dist_arr[i]) for i in np.flatnonzero(np.isfinite(dist_arr))}
+
+    inf = float("inf")
+    dist = [inf] * n
+    done = [False] * n
     pq = []
     for did in exit_door_ids:
-        dist[did] = 0.0
-        heapq.heappush(pq, (0.0, did))
+        i = id2ix[did]
+        dist[i] = 0.0
+        pq.append((0.0, i))
+    heapq.heapify(pq)
 
     while pq:
         d, u = heapq.heappop(pq)
-        if d != dist.get(u, float("inf")):
+        if done[u]:
             continue
-        for v, w in graph.get(u, []):
+        done[u] = True
+        for v, w in adj[u]:
             nd = d + w
-            if nd < dist.get(v, float("inf")):
+            if nd < dist[v]:
                 dist[v] = nd
                 heapq.heappush(pq, (nd, v))
-    return dist
+
+    return {ids[i]: dist[i] for i in range(n) if done[i]}
 
 
 # =========================
-# MAIN
+# Modelo cacheado (IFC + mapas + grids)
 # =========================
-def main():
-    model = ifcopenshell.open(IFC_PATH)
+@dataclass
+class RouteModel:
+    """Artefactos que solo dependen del IFC (no de reglas ni tipología)."""
+    model: object
+    spaces: list
+    doors: list
+    door_to_spaces: dict
+    space_to_doors: dict
+    space_polys: dict     # sid -> poly | None
+    space_grids: dict     # sid -> (grid, origin, res)
+    door_index: DoorIndex
+    spaces_by_id: dict    # sid -> IfcSpace
+    portal_cells: dict    # (sid, door_id) -> cell
+    door_any_cell: dict   # door_id -> (sid, cell)
+    door_graph: dict      # door_id -> [(door_id, w)], con level bridges
+    n_graph_nodes: int    # nodos antes de los level bridges
+    n_level_bridges: int
+    # sid -> grid_dijkstra_ctx(...), se rellena bajo demanda (vía scipy)
+    space_dijkstra_ctx: dict = field(default_factory=dict)
+
+
+def _space_grid_from_mesh(task):
+    """
+    task = (sid, verts, faces) -> (sid, poly | None, (grid, origin, res) | None).
+    A nivel de módulo para poder usarse con ProcessPoolExecutor.
+    """
+    sid, verts, faces = task
+    poly = footprint_from_space_mesh(verts, faces)
+    if poly is None:
+        return sid, None, None
+    return sid, poly, rasterize_polygon(poly, GRID_RES)
+
+
+def _build_route_model(ifc_path):
+    model = ifcopenshell.open(ifc_path)
     spaces = model.by_type("IfcSpace")
     doors = model.by_type("IfcDoor")
 
-    print(f"Spaces: {len(spaces)} | Doors: {len(doors)}")
-
     door_to_spaces, space_to_doors = build_space_door_maps_enhanced(model)
-    print(f"Doors adjacency (by inference): {len(door_to_spaces)} doors mapped to spaces")
 
-    # grids
+    # meshes (entidades IFC: no se pueden enviar a otros procesos)
     space_polys = {}
     space_grids = {}
+    tasks = []
+    meshes = get_space_meshes(model, spaces)
     for sp in spaces:
         sid = sp.GlobalId
         try:
-            verts, faces = get_shape_mesh(sp)
+            verts, faces = meshes.get(sid) or get_shape_mesh(sp)
         except Exception as e:
             print(f"[WARN] No mesh for space {sp.Name} ({sid}): {e}")
             space_polys[sid] = None
             continue
+        tasks.append((sid, verts, faces))
+
+    # footprint + grid: CPU puro e independiente por space. Con Numba el
+    # rasterizado (nogil) va en threads: evita hacer fork tras el iterador
+    # multihilo de geometría y, en spawn, reimportar ifcopenshell por worker
+    names = {sp.GlobalId: sp.Name for sp in spaces}
+    if len(tasks) > 1:
+        chunksize = max(1, len(tasks) // (4 * N_WORKERS))
+        pool_cls = ThreadPoolExecutor if HAS_NUMBA else ProcessPoolExecutor
+        with pool_cls(max_workers=N_WORKERS) as ex:
+            grid_results = list(ex.map(_space_grid_from_mesh, tasks, chunksize=chunksize))
+    else:
+        grid_results = [_space_grid_from_mesh(t) for t in tasks]
 
-        poly = footprint_from_space_mesh(verts, faces)
+    for sid, poly, grid_info in grid_results:
         space_polys[sid] = poly
         if poly is None:
-            print(f"[WARN] No footprint for space {sp.Name} ({sid})")
+            print(f"[WARN] No footprint for space {names[sid]} ({sid})")
             continue
+        space_grids[sid] = grid_info
+
+    # GUIDs y lookups una sola vez (cada acceso a atributo cruza a C++)
+    door_index = build_door_index(doors)
+    spaces_by_id = {sp.GlobalId: sp for sp in spaces}
+
+    # portales + grafo de puertas: también solo dependen del IFC
+    portal_cells, door_any_cell = build_door_cells(
+        door_index, space_polys, space_grids, space_to_doors
+    )
+    door_graph = build_door_graph(space_grids, portal_cells, space_to_doors)
+    n_graph_nodes = len(door_graph)
+    # add_level_bridge_edges modifica door_graph in situ: se hace aquí, una
+    # sola vez, y el grafo cacheado ya incluye los puentes
+    n_level_bridges = add_level_bridge_edges(
+        model, door_graph, door_index,
+        cost_per_meter_vertical=STAIR_COST_PER_M_VERTICAL,
+        horizontal_penalty=0.2
+    )
+
+    return RouteModel(model, spaces, doors, door_to_spaces, space_to_doors,
+                      space_polys, space_grids, door_index, spaces_by_id,
+                      portal_cells, door_any_cell, dict(door_graph), n_graph_nodes,
+                      n_level_bridges)
+
+
+@lru_cache(maxsize=8)
+def _load_route_model_cached(abs_path, mtime_ns, size):
+    return _build_route_model(abs_path)
+
+
+def load_route_model(ifc_path):
+    """
+    RouteModel del IFC, cacheado por (ruta, mtime_ns, size): mientras el
+    fichero no cambie no se vuelve a parsear ni a rasterizar.
+    Los artefactos son compartidos: no modificarlos (salvo la caché
+    space_dijkstra_ctx, que se rellena bajo demanda).
+    """
+    st = os.stat(ifc_path)
+    return _load_route_model_cached(os.path.abspath(ifc_path), st.st_mtime_ns, st.st_size)
+
+
+def _door_dijkstra_scipy(adj, n, source_ixs):
+    """
+    Multi-source Dijkstra del grafo de puertas con scipy.sparse.csgraph (C).
+    adj[i] = [(j, w), ...]; devuelve array (n,) con la distancia mínima a
+    cualquier source (inf = inalcanzable).
+    """
+    rows = np.fromiter((u for u, edges in enumerate(adj) for _ in edges), dtype=np.int64)
+    cols = np.fromiter((v for edges in adj for v, _ in edges), dtype=np.int64)
+    data = np.fromiter((w for edges in adj for _, w in edges), dtype=np.float64)
+
+    # aristas repetidas (p.ej. level bridges) -> quedarse con la mínima:
+    # csr_matrix sumaría los duplicados
+    key = rows * n + cols
+    order = np.lexsort((data, key))
+    key, data = key[order], data[order]
+    first = np.ones(key.size, dtype=bool)
+    first[1:] = key[1:] != key[:-1]
+    key, data = key[first], data[first]
+
+    # con (data, (row, col)) los ceros explícitos se conservan como aristas
+    graph = csr_matrix((data, (key // n, key % n)), shape=(n, n))
+    return csgraph_dijkstra(graph, directed=True, indices=np.asarray(source_ixs, dtype=np.int64),
+                            min_only=True)
+
 
-        grid, origin, res = rasterize_polygon(poly, GRID_RES)
-        space_grids[sid] = (grid, origin, res)
+# =========================
+# MAIN
+# =========================
+def _compute_space_maxdist(task):
+    """
+    Peor distancia de evacuación de un space.
+    task = (sid, sp_name, grid, res, seed_ys, seed_xs, seed_costs, ctx)
+        -> (worst, sp_name, sid) o None.
+    A nivel de módulo para poder usarse con ProcessPoolExecutor.
+    """
+    sid, sp_name, grid, res, seed_ys, seed_xs, seed_costs, ctx = task
+    dist_cells = grid_multisource_dijkstra_arrays(grid, res, seed_ys, seed_xs, seed_costs,
+                                                  diagonals=ALLOW_DIAGONALS, ctx=ctx)
+    # single masked reduction, no copy of the reachable cells
+    worst = float(np.max(dist_cells, where=np.isfinite(dist_cells), initial=-np.inf))
+    if worst == -np.inf:
+        return None
+    return (worst, sp_name, sid)
 
+
+def main():
+    rm = load_route_model(IFC_PATH)
+    spaces, doors = rm.spaces, rm.doors
+    door_to_spaces, space_to_doors = rm.door_to_spaces, rm.space_to_doors
+    space_grids = rm.space_grids
+
+    print(f"Spaces: {len(spaces)} | Doors: {len(doors)}")
+    print(f"Doors adjacency (by inference): {len(door_to_spaces)} doors mapped to spaces")
     print(f"Spaces with grid: {len(space_grids)}/{len(spaces)}")
 
     # exits
-    exit_door_ids = {d.GlobalId for d in doors if is_exit_door(d)}
+    door_index = rm.door_index
+    exit_door_ids = door_index.is_exit
     print(f"Exit doors detected: {len(exit_door_ids)}")
 
-    # door cells
-    portal_cells, door_any_cell, door_xyz, door_level = build_door_cells(
-        model, space_polys, space_grids, space_to_doors
-    )
+    # door cells + door graph (con level bridges), ya en el RouteModel
+    portal_cells, door_any_cell = rm.portal_cells, rm.door_any_cell
+    door_graph = rm.door_graph
     print(f"Portals with walkable cells (space-door): {len(portal_cells)}")
     print(f"Doors with at least one walkable placement: {len(door_any_cell)}/{len(doors)}")
-
-    # door graph
-    door_graph = build_door_graph(space_grids, portal_cells, space_to_doors)
-    print(f"Door graph nodes: {len(door_graph)} (doors with edges)")
-
-    # add vertical edges (LEVEL BRIDGE)
-    added_vert = add_level_bridge_edges(
-        model, door_graph, doors, door_xyz, door_level,
-        cost_per_meter_vertical=STAIR_COST_PER_M_VERTICAL,
-        horizontal_penalty=0.2
-    )
-    print(f"Added vertical (level-bridge) edges: {added_vert}")
+    print(f"Door graph nodes: {rm.n_graph_nodes} (doors with edges)")
+    print(f"Added vertical (level-bridge) edges: {rm.n_level_bridges}")
 
     # distances door->exit
     dist_door_to_exit = dijkstra_doors_to_exit(door_graph, exit_door_ids)
 
     # DEBUG unreachable doors
-    door_by_id = {d.GlobalId: d for d in doors}
-    unreached = [did for did in door_by_id.keys() if did not in dist_door_to_exit]
+    unreached = [did for did in door_index.by_id if did not in dist_door_to_exit]
     print("\nDoors unreachable from any exit:", len(unreached))
     for did in unreached:
-        d = door_by_id[did]
-        lvl = pset_get(d, "Level")
-        print(f"  - {d.Name} | {did} | Level={lvl}")
+        print(f"  - {door_index.name[did]} | {did} | Level={door_index.level[did]}")
+
+    # door -> exit como array denso (inf = inalcanzable)
+    door_ix = door_index.ix
+    dist_arr = np.array([dist_door_to_exit.get(did, np.inf) for did in door_index.ids],
+                        dtype=float)
+
+    # por space: índices de puerta con celda portal + esas celdas (iy, ix)
+    space_portals = {}
+    for sid, door_ids in space_to_doors.items():
+        pairs = [(door_ix[did], portal_cells[(sid, did)])
+                 for did in door_ids if (sid, did) in portal_cells]
+        if pairs:
+            space_portals[sid] = (
+                np.array([ix for ix, _ in pairs], dtype=np.int64),
+                np.array([cell for _, cell in pairs], dtype=np.int64).reshape(-1, 2),
+            )
 
     # per space worst
     per_space_max = []
     warn_count = 0
+    tasks = []
+    # sin Numba se usa csgraph: la CSR de cada space se construye una vez
+    # y queda en el RouteModel cacheado para las siguientes ejecuciones
+    use_ctx = HAS_SCIPY and not HAS_NUMBA
 
     for sp in spaces:
         sid = sp.GlobalId
@@ -750,27 +1548,39 @@ def main():
             continue
         grid, origin, res = space_grids[sid]
 
-        door_ids = list(space_to_doors.get(sid, []))
-        seeds = []
-        for did in door_ids:
-            base = dist_door_to_exit.get(did)
-            cell = portal_cells.get((sid, did))
-            if base is None or cell is None:
-                continue
-            seeds.append((cell[0], cell[1], float(base)))
+        # seeds = puertas del space con portal y alcanzables desde un exit
+        seeded = False
+        if sid in space_portals:
+            ix, cells = space_portals[sid]
+            costs = dist_arr[ix]
+            mask = np.isfinite(costs)
+            seeded = bool(mask.any())
 
-        if not seeds:
+        if not seeded:
             warn_count += 1
             print(f"[WARN] Space {sp.Name} ({sid}) has no seeded doors to an exit.")
             continue
 
-        dist_cells = grid_multisource_dijkstra(grid, res, seeds, diagonals=ALLOW_DIAGONALS)
-        walk = dist_cells[np.isfinite(dist_cells)]
-        if walk.size == 0:
+        ctx = None
+        if use_ctx:
+            ctx = rm.space_dijkstra_ctx.get(sid)
+            if ctx is None:
+                ctx = rm.space_dijkstra_ctx[sid] = grid_dijkstra_ctx(grid, res, ALLOW_DIAGONALS)
+        tasks.append((sid, sp.Name or "", grid, res,
+                      cells[mask, 0], cells[mask, 1], costs[mask], ctx))
+
+    # cada space es independiente: kernel Numba (nogil) -> threads,
+    # Dijkstra Python puro (GIL) -> procesos
+    pool_cls = ThreadPoolExecutor if HAS_NUMBA else ProcessPoolExecutor
+    with pool_cls(max_workers=N_WORKERS) as ex:
+        space_results = list(ex.map(_compute_space_maxdist, tasks, chunksize=8))
+
+    for r in space_results:
+        if r is None:
             continue
-        worst = float(np.max(walk))
-        per_space_max.append((worst, sp.Name or "", sid))
-        print(f"Space {sp.Name:>10} | worst evac dist ≈ {worst:6.2f} m")
+        worst, sp_name, sid = r
+        per_space_max.append(r)
+        print(f"Space {sp_name:>10} | worst evac dist ≈ {worst:6.2f} m")
 
     if not per_space_max:
         print("[ERROR] No spaces produced a worst distance.")
@@ -797,7 +1607,7 @@ def main():
         all_rules = load_regulation_rules(RULES_JSON)
         typology = (TYPOLOGY_OVERRIDE or "").strip()
 
-        spaces_by_id = {sp.GlobalId: sp for sp in spaces}
+        spaces_by_id = rm.spaces_by_id
 
         results = compliance_check_evacuation(
             per_space_data=per_space_max,